@@ -0,0 +1,71 @@
+import argparse
+import os
+import boto3
+from botocore.exceptions import ClientError
+from users_common.aws import dynamodb_resource
+from users_common.export import EXPORT_PAGE_SIZE, S3Destination, export_table
+from users_common.responses import dumps
+
+USERS_TABLE = os.environ.get('USERS_TABLE', 'users-dev')
+EXPORT_DIR = os.environ.get('EXPORT_DIR', '/tmp/users-export')
+EXPORT_TOTAL_SEGMENTS = int(os.environ.get('EXPORT_TOTAL_SEGMENTS', '4'))
+EXPORT_BUCKET = os.environ.get('EXPORT_BUCKET')
+EXPORT_PREFIX = os.environ.get('EXPORT_PREFIX', 'users-export')
+
+
+def users_table():
+    # One session and resource per worker thread, neither is thread-safe
+    return dynamodb_resource(session=boto3.session.Session()).Table(USERS_TABLE)
+
+
+def destination(bucket, prefix=EXPORT_PREFIX):
+    return S3Destination(boto3.client('s3'), bucket, prefix) if bucket else None
+
+
+def handler(event, context):
+    """
+    Export the users table as NDJSON part files, one per scan segment,
+    uploaded to the export bucket. Each invocation starts a new export;
+    pass the exportId it returned to resume that one instead.
+    """
+    try:
+        summary = export_table(
+            users_table,
+            event.get('outputDir', EXPORT_DIR),
+            total_segments=int(event.get('totalSegments', EXPORT_TOTAL_SEGMENTS)),
+            compress=bool(event.get('gzip', False)),
+            page_size=int(event.get('pageSize', EXPORT_PAGE_SIZE)),
+            export_id=event.get('exportId'),
+            destination=destination(event.get('bucket', EXPORT_BUCKET), event.get('prefix', EXPORT_PREFIX))
+        )
+        return {'statusCode': 200, 'body': dumps(summary)}
+
+    except ValueError as e:
+        return {'statusCode': 400, 'body': dumps({'error': str(e)})}
+
+    except ClientError as e:
+        print("DynamoDB error:", e)
+        return {'statusCode': 500, 'body': dumps({'error': 'Database error: ' + str(e)})}
+    except Exception as e:
+        print("Unhandled exception:", e)
+        return {'statusCode': 500, 'body': dumps({'error': 'Internal server error'})}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the users table as NDJSON')
+    parser.add_argument('output_dir')
+    parser.add_argument('--segments', type=int, default=EXPORT_TOTAL_SEGMENTS)
+    parser.add_argument('--page-size', type=int, default=EXPORT_PAGE_SIZE)
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--export-id', help='resume this export instead of starting a new one')
+    parser.add_argument('--bucket', default=EXPORT_BUCKET, help='upload the part files to this S3 bucket')
+    parser.add_argument('--prefix', default=EXPORT_PREFIX)
+    args = parser.parse_args()
+    summary = export_table(users_table, args.output_dir, total_segments=args.segments,
+                           compress=args.gzip, page_size=args.page_size, export_id=args.export_id,
+                           destination=destination(args.bucket, args.prefix))
+    print(dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,102 +3,180 @@ import boto3
 import os
 import re
 from botocore.exceptions import ClientError
+from users_common.aws import dynamodb_resource
+from users_common.cache import MISSING, user_cache
+from users_common.metrics import add_metric, instrumented, timed
+from users_common.pagination import (
+    LIST_MAX_PAGE_SIZE, LIST_PAGE_SIZE, MAX_TOTAL_SEGMENTS, InvalidCursor, projection, scan_page
+)
+from users_common.read_model import READ_MODEL_ATTRIBUTES, ReadModel
+from users_common.responses import error_response, json_response
+from users_common.validation import is_valid_email
 
-dynamodb = boto3.resource('dynamodb')
+dynamodb = dynamodb_resource()
 USERS_TABLE = os.environ.get('USERS_TABLE', 'users-dev')
 EMAIL_INDEX = 'email'
+# Attributes selectable with ?fields=, passed as placeholders in ExpressionAttributeNames
+FIELD_PATTERN = re.compile(r'[A-Za-z_][A-Za-z0-9_]{0,63}\Z')
+MAX_FIELDS = 20
+# Set to serve lookups from the email read model maintained by UserStreamHandler
+READ_MODEL_TABLE = os.environ.get('READ_MODEL_TABLE')
+read_model = ReadModel(dynamodb.Table(READ_MODEL_TABLE)) if READ_MODEL_TABLE else None
 
 
+@instrumented('GetUserHandler')
 def handler(event, context):
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': '*',
-        'Access-Control-Allow-Methods': '*',
-    }
-
     try:
+        if is_list_request(event):
+            # Listing is for direct (IAM-authorized) invocations, never the public API
+            if event.get('requestContext'):
+                return error_response(403, 'Forbidden')
+            return list_users(event)
+
         query_params = event.get('queryStringParameters') or {}
         email = query_params.get('email', '').strip()
 
         if not email:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'Email query parameter is required'})
-            }
+            return error_response(400, 'Email query parameter is required')
 
         if not is_valid_email(email):
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'Invalid email format'})
-            }
+            return error_response(400, 'Invalid email format')
+
+        fields = parse_fields(query_params.get('fields'))
+        if fields is False:
+            return error_response(400, 'Invalid fields parameter')
+        exists_only = query_params.get('exists', '').lower() in ('1', 'true')
+
+        cached = user_cache.get(email)
+        if cached is not MISSING:
+            log_cache('hit')
+            if exists_only:
+                return json_response(200, {'exists': cached is not None})
+            if cached is None:
+                return error_response(404, 'User not found')
+            return json_response(200, project(cached, fields))
+        log_cache('miss')
+
+        # The read model only holds the summary attributes: it answers existence
+        # checks and field selections within them, never full-item lookups
+        if read_model and (exists_only or (fields and set(fields) <= set(READ_MODEL_ATTRIBUTES))):
+            user = read_model.get(email)
+            if user is not MISSING:
+                add_metric('ReadModelHit', 1)
+                # user_cache holds full items, so only the absence of a user is cached
+                if user is None:
+                    user_cache.put_missing(email)
+                if exists_only:
+                    return json_response(200, {'exists': user is not None})
+                if user is None:
+                    return error_response(404, 'User not found')
+                return json_response(200, project(user, fields))
+            # Not in the read model yet (e.g. created before the stream consumer) or shared
+            add_metric('ReadModelMiss', 1)
 
         table = dynamodb.Table(USERS_TABLE)
+        key_condition = boto3.dynamodb.conditions.Key('email').eq(email)
 
-        response = table.query(
-            IndexName=EMAIL_INDEX,
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('email').eq(email)
-        )
+        if exists_only:
+            # Existence check only: no item is read back
+            response = timed(
+                'Query', table.query,
+                IndexName=EMAIL_INDEX,
+                KeyConditionExpression=key_condition,
+                Select='COUNT',
+                Limit=1
+            )
+            exists = response.get('Count', 0) > 0
+            if not exists:
+                user_cache.put_missing(email)
+            return json_response(200, {'exists': exists})
+
+        query = {'IndexName': EMAIL_INDEX, 'KeyConditionExpression': key_condition}
+        if fields:
+            query['ProjectionExpression'], query['ExpressionAttributeNames'] = projection(fields)
+        response = timed('Query', table.query, **query)
 
         if response.get('Count', 0) == 0:
-            return {
-                'statusCode': 404,
-                'headers': headers,
-                'body': json.dumps({'error': 'User not found'})
-            }
+            user_cache.put_missing(email)
+            return error_response(404, 'User not found')
 
         user = response['Items'][0]
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps(user)
-        }
+        # Only whole items are cached, projected ones are partial
+        if not fields:
+            user_cache.put(email, user)
+        return json_response(200, user)
 
     except ClientError as e:
         print("DynamoDB error:", e)
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': 'Database error: ' + str(e)})
-        }
+        return json_response(500, {'error': 'Database error: ' + str(e)})
     except Exception as e:
         print("Unhandled exception:", e)
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': 'Internal server error'})
-        }
+        return error_response(500, 'Internal server error')
 
 
-def is_valid_email(email):
-    if not email or '@' not in email:
+def parse_fields(value):
+    """
+    Attribute names from a comma-separated fields parameter: None when not
+    given, False when invalid
+    """
+    if value is None or not value.strip():
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',')))
+    if len(fields) > MAX_FIELDS or not all(FIELD_PATTERN.match(f) for f in fields):
         return False
+    return fields
+
+
+def project(user, fields):
+    if not fields:
+        return user
+    return {f: user[f] for f in fields if f in user}
+
+
+def is_list_request(event):
+    path = event.get('path') or ''
+    return path.rstrip('/').endswith('/users/list')
+
+
+def list_users(event):
+    query_params = event.get('queryStringParameters') or {}
+
+    page_size = parse_int(query_params.get('limit'), LIST_PAGE_SIZE)
+    if page_size is None or not 1 <= page_size <= LIST_MAX_PAGE_SIZE:
+        return error_response(400, 'Limit must be between 1 and ' + str(LIST_MAX_PAGE_SIZE))
+
+    # Optional parallel scan segment, e.g. one export worker per segment
+    segment = total_segments = None
+    if 'segment' in query_params or 'totalSegments' in query_params:
+        segment = parse_int(query_params.get('segment'), None)
+        total_segments = parse_int(query_params.get('totalSegments'), None)
+        if (total_segments is None or segment is None
+                or not 1 <= total_segments <= MAX_TOTAL_SEGMENTS
+                or not 0 <= segment < total_segments):
+            return error_response(400, 'Invalid segment')
+
+    table = dynamodb.Table(USERS_TABLE)
     try:
-        local, domain = email.rsplit('@', 1)
-    except ValueError:
-        return False
-    if not local or len(local) > 64:
-        return False
-    if not domain or len(domain) > 255:
-        return False
-    if '.' not in domain or domain.startswith('.') or domain.endswith('.'):
-        return False
-    if '..' in email:
-        return False
-    local_pattern = r'^[a-zA-Z0-9._%+-]+$'
-    if not re.match(local_pattern, local):
-        return False
-    domain_pattern = r'^[a-zA-Z0-9.-]+$'
-    if not re.match(domain_pattern, domain):
-        return False
-    domain_parts = domain.split('.')
-    if len(domain_parts) < 2:
-        return False
-    tld = domain_parts[-1]
-    if len(tld) < 2 or not tld.isalpha():
-        return False
-    for part in domain_parts:
-        if not part:
-            return False
-    return True
\ No newline at end of file
+        page = scan_page(
+            table, page_size,
+            cursor=query_params.get('cursor'),
+            segment=segment,
+            total_segments=total_segments
+        )
+    except InvalidCursor:
+        return error_response(400, 'Invalid cursor')
+    return json_response(200, page)
+
+
+def parse_int(value, default):
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def log_cache(outcome):
+    add_metric('UserCacheHit' if outcome == 'hit' else 'UserCacheMiss', 1)
+    print("User cache " + outcome + ":", json.dumps(user_cache.stats()))
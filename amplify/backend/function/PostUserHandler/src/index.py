@@ -2,176 +2,228 @@ import json
 import boto3
 import os
 import uuid
-import re
 from botocore.exceptions import ClientError
-
-dynamodb = boto3.resource('dynamodb')
+from users_common.aws import dynamodb_resource
+from users_common.cache import user_cache
+from users_common.idempotency import (
+    IDEMPOTENCY_TABLE, IdempotencyStore, InvalidKey, KeyReused, RequestInProgress,
+    idempotency_key, request_hash
+)
+from users_common.metrics import instrumented, timed
+from users_common.responses import HEADERS, error_response, json_response
+from users_common.validation import is_valid_email, validate_many
+
+dynamodb = dynamodb_resource()
 USERS_TABLE = os.environ.get('USERS_TABLE', 'users-dev')
 EMAIL_INDEX = 'email'
+# BatchWriteItem accepts at most 25 put requests
+WRITE_BATCH_SIZE = 25
+
+idempotency = IdempotencyStore(dynamodb.Table(IDEMPOTENCY_TABLE))
 
 
+@instrumented('PostUserHandler')
 def handler(event, context):
-    headers = {
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': '*',
-        'Access-Control-Allow-Methods': '*',
-    }
+    # Unexpected errors in a batch propagate so SQS retries the whole batch
+    if is_sqs_event(event):
+        return handle_sqs_batch(event)
 
     try:
-        if 'body' in event and event['body']:
-            # API Gateway format - body is a JSON string
-            try:
-                data = json.loads(event['body'])
-            except json.JSONDecodeError:
-                return {
-                    'statusCode': 400,
-                    'headers': headers,
-                    'body': json.dumps({'error': 'Invalid JSON in request body'})
-                }
-        elif 'email' in event:
-            # Direct invocation format - data is directly in event
-            data = event
-        else:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'Request body is required'})
-            }
-
-        email = data.get('email', '').strip()
-        if not email:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'Email is required'})
-            }
-
-        # Get optional name field
-        name = data.get('name', '').strip()
-
-        # Strict email format validation
-        if not is_valid_email(email):
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'Invalid email format'})
-            }
-
-        # Validate name if provided
-        if name and len(name) > 100:
-            return {
-                'statusCode': 400,
-                'headers': headers,
-                'body': json.dumps({'error': 'Name must be less than 100 characters'})
-            }
-
-        table = dynamodb.Table(USERS_TABLE)
-
-        # Check for existing user with the same email
-        existing = table.query(
-            IndexName=EMAIL_INDEX,
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('email').eq(email)
-        )
-
-        if existing.get('Count', 0) > 0:
-            return {
-                'statusCode': 409,
-                'headers': headers,
-                'body': json.dumps({'error': 'User with this email already exists'})
-            }
-
-        # Create new user
-        user_id = str(uuid.uuid4())
-        user = {
-            'id': user_id, 
-            'email': email
-        }
-        
-        # Add name if provided
-        if name:
-            user['name'] = name
-
-        table.put_item(Item=user)
-
-        return {
-            'statusCode': 201,
-            'headers': headers,
-            'body': json.dumps(user)
-        }
+        key = idempotency_key(event)
+        if key is None:
+            return create_user(event)
+        return create_user_once(event, key)
 
+    except InvalidKey as e:
+        return error_response(400, str(e))
     except ClientError as e:
         print("DynamoDB error:", e)
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': 'Database error: ' + str(e)})
-        }
+        return json_response(500, {'error': 'Database error: ' + str(e)})
     except Exception as e:
         print("Unhandled exception:", e)
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': 'Internal server error'})
-        }
+        return error_response(500, 'Internal server error')
+
+
+def create_user(event):
+    if 'body' in event and event['body']:
+        # API Gateway format - body is a JSON string
+        try:
+            data = json.loads(event['body'])
+        except json.JSONDecodeError:
+            return error_response(400, 'Invalid JSON in request body')
+    elif 'email' in event:
+        # Direct invocation format - data is directly in event
+        data = event
+    else:
+        return error_response(400, 'Request body is required')
+
+    email, name = user_fields(data)
+    error = validation_error(email, name, is_valid_email(email))
+    if error:
+        return error_response(400, error)
+
+    table = dynamodb.Table(USERS_TABLE)
+
+    # Check for existing user with the same email
+    existing = timed(
+        'Query', table.query,
+        IndexName=EMAIL_INDEX,
+        KeyConditionExpression=boto3.dynamodb.conditions.Key('email').eq(email)
+    )
+
+    if existing.get('Count', 0) > 0:
+        user_cache.put(email, existing['Items'][0])
+        return error_response(409, 'User with this email already exists')
+
+    # Create new user
+    user = new_user(email, name)
+    timed('PutItem', table.put_item, Item=user)
+    user_cache.put(email, user)
+
+    return json_response(201, user)
+
+
+def create_user_once(event, key):
+    """
+    create_user guarded by an Idempotency-Key: the first 201 is stored and
+    replayed to retries without touching the users table again
+    """
+    try:
+        cached = idempotency.begin(key, request_hash(event.get('body')))
+    except RequestInProgress:
+        return error_response(409, 'A request with this Idempotency-Key is already in progress')
+    except KeyReused:
+        return error_response(422, 'Idempotency-Key was already used for a different request')
+    if cached is not None:
+        return {'statusCode': cached['statusCode'], 'headers': HEADERS, 'body': cached['body']}
+
+    try:
+        response = create_user(event)
+    except Exception:
+        idempotency.release(key)
+        raise
+    if response['statusCode'] == 201:
+        idempotency.complete(key, response)
+    else:
+        idempotency.release(key)
+    return response
+
+
+def user_fields(data):
+    """
+    Trimmed email and optional name from a request payload
+    """
+    return data.get('email', '').strip(), data.get('name', '').strip()
+
 
+def validation_error(email, name, email_valid):
+    if not email:
+        return 'Email is required'
+    # Strict email format validation
+    if not email_valid:
+        return 'Invalid email format'
+    # Validate name if provided
+    if name and len(name) > 100:
+        return 'Name must be less than 100 characters'
+    return None
+
+
+def new_user(email, name):
+    user = {
+        'id': str(uuid.uuid4()),
+        'email': email
+    }
+    # Add name if provided
+    if name:
+        user['name'] = name
+    return user
 
-def is_valid_email(email):
+
+def is_sqs_event(event):
+    records = event.get('Records')
+    return bool(records) and records[0].get('eventSource') == 'aws:sqs'
+
+
+def handle_sqs_batch(event):
     """
-    Validate email format with strict rules
+    Create the users queued in an SQS batch. Invalid or duplicate users can
+    never succeed and are dropped; only messages that hit a DynamoDB error
+    are reported in batchItemFailures so SQS redelivers just those.
+    """
+    records = []
+    for record in event['Records']:
+        try:
+            email, name = user_fields(json.loads(record['body']))
+        except (TypeError, ValueError, AttributeError):
+            print("Dropping malformed message:", record.get('messageId'))
+            continue
+        records.append((record['messageId'], email, name))
+
+    table = dynamodb.Table(USERS_TABLE)
+    failures = []
+    pending = []
+    seen = set()
+    valid = validate_many([email for _, email, _ in records])
+    for (message_id, email, name), email_valid in zip(records, valid):
+        error = validation_error(email, name, email_valid)
+        if error:
+            print("Dropping invalid message:", message_id, error)
+            continue
+        # Only the first message for an email in the batch creates the user
+        if email in seen:
+            print("Dropping duplicate message:", message_id)
+            continue
+        seen.add(email)
+        try:
+            existing = timed(
+                'Query', table.query,
+                IndexName=EMAIL_INDEX,
+                KeyConditionExpression=boto3.dynamodb.conditions.Key('email').eq(email)
+            )
+        except ClientError as e:
+            print("DynamoDB error:", e)
+            failures.append(message_id)
+            continue
+        if existing.get('Count', 0) > 0:
+            user_cache.put(email, existing['Items'][0])
+            print("Dropping message for existing user:", message_id)
+            continue
+        pending.append((message_id, new_user(email, name)))
+
+    write_failures = []
+    for start in range(0, len(pending), WRITE_BATCH_SIZE):
+        write_failures.extend(write_users(pending[start:start + WRITE_BATCH_SIZE]))
+    failures.extend(write_failures)
+
+    print("Processed SQS batch:", json.dumps({
+        'records': len(event['Records']),
+        'created': len(pending) - len(write_failures),
+        'failed': len(failures)
+    }))
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
+
+
+def write_users(chunk):
+    """
+    Write up to 25 users with one BatchWriteItem, returning the message ids
+    of the users that were not written
     """
-    # Basic structure check
-    if not email or '@' not in email:
-        return False
-    
-    # Split into local and domain parts
     try:
-        local, domain = email.rsplit('@', 1)
-    except ValueError:
-        return False
-    
-    # Check local part (before @)
-    if not local or len(local) > 64:
-        return False
-    
-    # Check domain part (after @)
-    if not domain or len(domain) > 255:
-        return False
-    
-    # Domain must contain at least one dot
-    if '.' not in domain:
-        return False
-    
-    # Domain cannot start or end with dot
-    if domain.startswith('.') or domain.endswith('.'):
-        return False
-    
-    # Check for consecutive dots
-    if '..' in email:
-        return False
-    
-    # Check for valid characters in local part
-    local_pattern = r'^[a-zA-Z0-9._%+-]+$'
-    if not re.match(local_pattern, local):
-        return False
-    
-    # Check for valid characters in domain part
-    domain_pattern = r'^[a-zA-Z0-9.-]+$'
-    if not re.match(domain_pattern, domain):
-        return False
-    
-    # Domain must have at least one part after the last dot (TLD)
-    domain_parts = domain.split('.')
-    if len(domain_parts) < 2:
-        return False
-    
-    # Last part (TLD) must be at least 2 characters and only letters
-    tld = domain_parts[-1]
-    if len(tld) < 2 or not tld.isalpha():
-        return False
-    
-    # Domain parts cannot be empty
-    for part in domain_parts:
-        if not part:
-            return False
-    
-    return True
\ No newline at end of file
+        response = timed('BatchWriteItem', dynamodb.batch_write_item, RequestItems={
+            USERS_TABLE: [{'PutRequest': {'Item': user}} for _, user in chunk]
+        })
+    except ClientError as e:
+        print("DynamoDB error:", e)
+        return [message_id for message_id, _ in chunk]
+
+    unprocessed = {
+        request['PutRequest']['Item']['id']
+        for request in response.get('UnprocessedItems', {}).get(USERS_TABLE, [])
+    }
+    failed = []
+    for message_id, user in chunk:
+        if user['id'] in unprocessed:
+            failed.append(message_id)
+        else:
+            user_cache.put(user['email'], user)
+    return failed
@@ -0,0 +1,48 @@
+import json
+from botocore.exceptions import ClientError
+from users_common.aws import dynamodb_resource
+from users_common.metrics import add_metric, instrumented
+from users_common.read_model import READ_MODEL_TABLE, ReadModel
+
+dynamodb = dynamodb_resource()
+read_model = ReadModel(dynamodb.Table(READ_MODEL_TABLE))
+
+
+@instrumented('UserStreamHandler')
+def handler(event, context):
+    """
+    Apply a users table stream batch to the email read model. Records are
+    applied in order; at the first one that fails the rest of the batch is
+    left alone and its sequence number is reported, so Lambda retries from
+    there. Records applied twice are no-ops.
+    """
+    records = event.get('Records') or []
+    applied = skipped = 0
+    failure = None
+    for record in records:
+        try:
+            if read_model.apply(record):
+                applied += 1
+            else:
+                skipped += 1
+        except ClientError as e:
+            print("DynamoDB error:", e)
+            failure = record
+        except (KeyError, TypeError) as e:
+            # Retrying can never fix it, and it would block the shard
+            print("Dropping malformed stream record:", record.get('eventID'), e)
+            skipped += 1
+        if failure is not None:
+            break
+
+    add_metric('ReadModelRecordsApplied', applied)
+    add_metric('ReadModelRecordsSkipped', skipped)
+    print("Processed stream batch:", json.dumps({
+        'records': len(records),
+        'applied': applied,
+        'skipped': skipped,
+        'retried': len(records) - applied - skipped
+    }))
+    if failure is None:
+        return {'batchItemFailures': []}
+    return {'batchItemFailures': [{'itemIdentifier': failure['dynamodb']['SequenceNumber']}]}
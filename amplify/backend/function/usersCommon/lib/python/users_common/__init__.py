@@ -0,0 +1 @@
+"""Code shared by the user Lambda handlers (deployed as the usersCommon layer)."""
@@ -0,0 +1,48 @@
+import os
+import boto3
+from botocore.config import Config
+
+# Defaults keep a slow DynamoDB call well inside the 25 s Lambda timeout:
+# each attempt waits at most connect + read timeout before it is retried
+DEFAULTS = {
+    'DYNAMODB_CONNECT_TIMEOUT': '1',
+    'DYNAMODB_READ_TIMEOUT': '2',
+    'DYNAMODB_MAX_ATTEMPTS': '3',
+    'DYNAMODB_RETRY_MODE': 'adaptive',
+    'DYNAMODB_MAX_POOL_CONNECTIONS': '25',
+    'DYNAMODB_TCP_KEEPALIVE': 'true',
+}
+
+
+def client_config(environ=None, **overrides):
+    """
+    botocore Config for DynamoDB clients, read from the DYNAMODB_* environment
+    variables; keyword arguments take precedence
+    """
+    environ = os.environ if environ is None else environ
+
+    def setting(name):
+        return environ.get(name, DEFAULTS[name])
+
+    options = {
+        'connect_timeout': float(setting('DYNAMODB_CONNECT_TIMEOUT')),
+        'read_timeout': float(setting('DYNAMODB_READ_TIMEOUT')),
+        'retries': {
+            'mode': setting('DYNAMODB_RETRY_MODE'),
+            # total_max_attempts counts the first call, botocore's max_attempts does not
+            'total_max_attempts': int(setting('DYNAMODB_MAX_ATTEMPTS'))
+        },
+        'max_pool_connections': int(setting('DYNAMODB_MAX_POOL_CONNECTIONS')),
+        'tcp_keepalive': setting('DYNAMODB_TCP_KEEPALIVE').lower() in ('1', 'true', 'yes'),
+    }
+    options.update(overrides)
+    return Config(**options)
+
+
+def dynamodb_resource(endpoint_url=None, session=None, **overrides):
+    """
+    DynamoDB resource shared by the handlers, created once per container.
+    Threads building their own resource must pass their own session, as the
+    default boto3 session is not thread-safe.
+    """
+    return (session or boto3).resource('dynamodb', endpoint_url=endpoint_url, config=client_config(**overrides))
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '1024'))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', '60'))
+USER_CACHE_NEGATIVE_TTL = float(os.environ.get('USER_CACHE_NEGATIVE_TTL', '10'))
+
+# Returned by UserCache.get when nothing usable is cached for the email
+MISSING = object()
+
+
+def normalize_email(email):
+    """
+    Cache key for an email. Lookups on the email GSI are case-sensitive,
+    so only surrounding whitespace is dropped.
+    """
+    return (email or '').strip()
+
+
+class UserCache:
+    """
+    Bounded LRU cache of user items keyed by email, living as long as the
+    Lambda container. A cached None means the user is known not to exist
+    (404) and expires after the shorter negative TTL.
+    """
+
+    def __init__(self, max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL,
+                 negative_ttl=USER_CACHE_NEGATIVE_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        key = normalize_email(email)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, user = entry
+                if expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return user
+                del self._entries[key]
+            self.misses += 1
+            return MISSING
+
+    def put(self, email, user):
+        self._store(email, user, self.ttl)
+
+    def put_missing(self, email):
+        self._store(email, None, self.negative_ttl)
+
+    def invalidate(self, email):
+        with self._lock:
+            self._entries.pop(normalize_email(email), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def _store(self, email, user, ttl):
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        key = normalize_email(email)
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by every handler imported in this process, so PostUserHandler can
+# prime or invalidate what GetUserHandler serves when both run locally.
+user_cache = UserCache()
@@ -0,0 +1,191 @@
+import gzip
+import json
+import os
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from users_common.pagination import scan_page
+from users_common.responses import dumps
+
+EXPORT_PAGE_SIZE = int(os.environ.get('EXPORT_PAGE_SIZE', '1000'))
+EXPORT_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+
+def new_export_id():
+    """Sortable and unique per run, e.g. 20250701T040000Z-1a2b3c4d"""
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ') + '-' + uuid.uuid4().hex[:8]
+
+
+def check_export_id(export_id):
+    # Used as a directory name and an S3 key prefix
+    if not isinstance(export_id, str) or not EXPORT_ID_PATTERN.match(export_id):
+        raise ValueError('Invalid export id: %r' % (export_id,))
+    return export_id
+
+
+def ndjson_chunk(items, compress=False):
+    """
+    One page of items as NDJSON bytes. Compressed chunks are complete gzip
+    members, so they can be concatenated into a valid .ndjson.gz stream.
+    """
+    data = ''.join(dumps(item) + '\n' for item in items).encode()
+    return gzip.compress(data, compresslevel=6) if compress else data
+
+
+def iter_ndjson(table, segment=None, total_segments=None, compress=False,
+                page_size=EXPORT_PAGE_SIZE):
+    """
+    Yield the table (or one scan segment) as NDJSON chunks, one page at a
+    time, e.g. to write them to a response stream without buffering the table
+    """
+    cursor = None
+    while True:
+        page = scan_page(table, page_size, cursor, segment, total_segments, attributes=None)
+        if page['items']:
+            yield ndjson_chunk(page['items'], compress)
+        cursor = page['nextCursor']
+        if cursor is None:
+            return
+
+
+def part_path(out_dir, segment, total_segments, compress=False):
+    suffix = '.ndjson.gz' if compress else '.ndjson'
+    return os.path.join(out_dir, f'users-{segment:04d}-of-{total_segments:04d}{suffix}')
+
+
+def checkpoint_path(out_dir, segment, total_segments):
+    return os.path.join(out_dir, f'users-{segment:04d}-of-{total_segments:04d}.checkpoint.json')
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'cursor': None, 'offset': 0, 'items': 0, 'done': False}
+
+
+def save_checkpoint(path, checkpoint):
+    # Write then rename so a crash never leaves a half-written checkpoint
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def export_segment(table, out_dir, segment, total_segments, compress=False,
+                   page_size=EXPORT_PAGE_SIZE):
+    """
+    Export one scan segment to its part file, resuming from its checkpoint.
+    The part file is truncated back to the last checkpointed offset, so a
+    page written before a crash is not duplicated on resume.
+    """
+    part = part_path(out_dir, segment, total_segments, compress)
+    ckpt_path = checkpoint_path(out_dir, segment, total_segments)
+    checkpoint = load_checkpoint(ckpt_path)
+    if checkpoint['done']:
+        return checkpoint
+
+    with open(part, 'ab') as f:
+        f.truncate(checkpoint['offset'])
+        f.seek(checkpoint['offset'])
+        while True:
+            page = scan_page(table, page_size, checkpoint['cursor'], segment, total_segments,
+                             attributes=None)
+            if page['items']:
+                f.write(ndjson_chunk(page['items'], compress))
+                f.flush()
+                os.fsync(f.fileno())
+            checkpoint = {
+                'cursor': page['nextCursor'],
+                'offset': f.tell(),
+                'items': checkpoint['items'] + len(page['items']),
+                'done': page['nextCursor'] is None,
+            }
+            save_checkpoint(ckpt_path, checkpoint)
+            if checkpoint['done']:
+                return checkpoint
+
+
+class S3Destination:
+    """
+    Uploads finished part files under <prefix>/<export id>/ in an S3 bucket.
+    A segment already uploaded for the same export id is not exported again,
+    so a run can resume in a fresh container whose /tmp is empty.
+    """
+
+    def __init__(self, client, bucket, prefix=''):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def key(self, export_id, name):
+        return '/'.join(p for p in (self.prefix, export_id, name) if p)
+
+    def uri(self, export_id, name):
+        return f's3://{self.bucket}/{self.key(export_id, name)}'
+
+    def uploaded_items(self, export_id, name):
+        """Item count of an uploaded part file, None when it is not uploaded yet"""
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.key(export_id, name))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return int(head['Metadata']['items'])
+
+    def upload(self, export_id, path, items):
+        self.client.upload_file(path, self.bucket, self.key(export_id, os.path.basename(path)),
+                                ExtraArgs={'Metadata': {'items': str(items)}})
+
+    def write_manifest(self, export_id, summary):
+        self.client.put_object(Bucket=self.bucket, Key=self.key(export_id, 'manifest.json'),
+                               Body=dumps(summary).encode(), ContentType='application/json')
+
+
+def export_table(table_factory, out_dir, total_segments=4, compress=False,
+                 page_size=EXPORT_PAGE_SIZE, max_workers=None, export_id=None, destination=None):
+    """
+    Parallel Scan of the whole table into one NDJSON part file per segment.
+    table_factory is called once per segment, as boto3 resources must not be
+    shared between threads.
+
+    Part files are written to out_dir/<export id>. Every call starts a new
+    export unless export_id names an earlier one, which is then resumed.
+    With a destination, finished parts are uploaded and removed locally.
+    """
+    export_id = check_export_id(export_id) if export_id is not None else new_export_id()
+    export_dir = os.path.join(out_dir, export_id)
+    os.makedirs(export_dir, exist_ok=True)
+
+    def run(segment):
+        part = part_path(export_dir, segment, total_segments, compress)
+        if destination is not None:
+            items = destination.uploaded_items(export_id, os.path.basename(part))
+            if items is not None:
+                return items
+        checkpoint = export_segment(table_factory(), export_dir, segment, total_segments, compress, page_size)
+        if destination is not None:
+            destination.upload(export_id, part, checkpoint['items'])
+            os.remove(part)
+            os.remove(checkpoint_path(export_dir, segment, total_segments))
+        return checkpoint['items']
+
+    with ThreadPoolExecutor(max_workers=max_workers or total_segments) as pool:
+        items = list(pool.map(run, range(total_segments)))
+
+    parts = [part_path(export_dir, s, total_segments, compress) for s in range(total_segments)]
+    summary = {
+        'exportId': export_id,
+        'totalSegments': total_segments,
+        'items': sum(items),
+        'files': [destination.uri(export_id, os.path.basename(p)) for p in parts] if destination else parts,
+    }
+    if destination is not None:
+        destination.write_manifest(export_id, summary)
+    return summary
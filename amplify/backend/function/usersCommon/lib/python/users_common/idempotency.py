@@ -0,0 +1,128 @@
+import hashlib
+import os
+import time
+from botocore.exceptions import ClientError
+from users_common.metrics import timed
+
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE', 'idempotency-dev')
+# How long a completed response is replayed; expiresAt is the table's TTL attribute
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', '86400'))
+# How long an unfinished request blocks others using the same key
+IDEMPOTENCY_LOCK_TTL = int(os.environ.get('IDEMPOTENCY_LOCK_TTL', '30'))
+IDEMPOTENCY_HEADER = 'idempotency-key'
+MAX_KEY_LENGTH = 255
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+
+
+class IdempotencyError(Exception):
+    pass
+
+
+class RequestInProgress(IdempotencyError):
+    pass
+
+
+class KeyReused(IdempotencyError):
+    pass
+
+
+class InvalidKey(IdempotencyError):
+    pass
+
+
+def idempotency_key(event):
+    """
+    Value of the Idempotency-Key header (case-insensitive), or None
+    """
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == IDEMPOTENCY_HEADER and value and value.strip():
+            key = value.strip()
+            if len(key) > MAX_KEY_LENGTH:
+                raise InvalidKey('Idempotency-Key must be at most 255 characters')
+            return key
+    return None
+
+
+def request_hash(body):
+    return hashlib.sha256((body or '').encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Idempotency records in DynamoDB, keyed by the client's Idempotency-Key.
+    A conditional put claims the key, so concurrent duplicates do the work once.
+    """
+
+    def __init__(self, table, ttl=IDEMPOTENCY_TTL, lock_ttl=IDEMPOTENCY_LOCK_TTL, clock=time.time):
+        self.table = table
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.clock = clock
+
+    def begin(self, key, fingerprint):
+        """
+        Claim the key. Returns the stored response when the request already
+        completed, None when the caller must do the work.
+        """
+        now = int(self.clock())
+        try:
+            timed(
+                'IdempotencyPutItem', self.table.put_item,
+                Item={
+                    'id': key,
+                    'status': IN_PROGRESS,
+                    'requestHash': fingerprint,
+                    'lockExpiresAt': now + self.lock_ttl,
+                    'expiresAt': now + self.ttl
+                },
+                # Expired records may linger until DynamoDB's TTL sweep deletes them
+                ConditionExpression='attribute_not_exists(id) OR expiresAt < :now '
+                                    'OR (#status = :in_progress AND lockExpiresAt < :now)',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':now': now, ':in_progress': IN_PROGRESS}
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        record = timed('IdempotencyGetItem', self.table.get_item,
+                       Key={'id': key}, ConsistentRead=True).get('Item')
+        if record is None:
+            raise RequestInProgress(key)
+        if record.get('requestHash') != fingerprint:
+            raise KeyReused(key)
+        if record['status'] != COMPLETED:
+            raise RequestInProgress(key)
+        return {'statusCode': int(record['statusCode']), 'body': record['body']}
+
+    def complete(self, key, response):
+        timed(
+            'IdempotencyUpdateItem', self.table.update_item,
+            Key={'id': key},
+            UpdateExpression='SET #status = :completed, statusCode = :code, body = :body',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':completed': COMPLETED,
+                ':code': response['statusCode'],
+                ':body': response['body']
+            }
+        )
+
+    def release(self, key):
+        """
+        Forget an unfinished request so a retry can run it again
+        """
+        try:
+            timed(
+                'IdempotencyDeleteItem', self.table.delete_item,
+                Key={'id': key},
+                ConditionExpression='#status = :in_progress',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':in_progress': IN_PROGRESS}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
@@ -0,0 +1,112 @@
+import contextvars
+import functools
+import json
+import os
+import time
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'UserService')
+
+# Services that already handled an invocation in this container
+_warm_services = set()
+_current = contextvars.ContextVar('metrics', default=None)
+
+
+class Metrics:
+    """
+    Metrics of one invocation, printed as a CloudWatch Embedded Metric
+    Format (EMF) log line that CloudWatch turns into metrics
+    """
+
+    def __init__(self, service, cold_start, clock=time.perf_counter):
+        self.service = service
+        self.cold_start = cold_start
+        self.clock = clock
+        self.metrics = {}
+        self.properties = {}
+
+    def add(self, name, value, unit='Count'):
+        values, _ = self.metrics.setdefault(name, ([], unit))
+        values.append(value)
+
+    def call(self, operation, method, **kwargs):
+        """
+        Run a DynamoDB call, recording its latency and consumed capacity
+        """
+        kwargs.setdefault('ReturnConsumedCapacity', 'TOTAL')
+        start = self.clock()
+        try:
+            return_value = method(**kwargs)
+        finally:
+            self.add(operation + 'Latency', (self.clock() - start) * 1000, 'Milliseconds')
+        capacity = return_value.get('ConsumedCapacity')
+        if capacity is not None:
+            # BatchWriteItem reports one entry per table
+            entries = capacity if isinstance(capacity, list) else [capacity]
+            self.add(operation + 'ConsumedCapacity',
+                     sum(float(c.get('CapacityUnits', 0)) for c in entries))
+        return return_value
+
+    def document(self, timestamp=None):
+        definitions = [{'Name': name, 'Unit': unit} for name, (_, unit) in self.metrics.items()]
+        document = {
+            '_aws': {
+                'Timestamp': int((time.time() if timestamp is None else timestamp) * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Service'], ['Service', 'ColdStart']],
+                    'Metrics': definitions
+                }]
+            },
+            'Service': self.service,
+            'ColdStart': 'true' if self.cold_start else 'false',
+        }
+        document.update(self.properties)
+        for name, (values, _) in self.metrics.items():
+            document[name] = values[0] if len(values) == 1 else values
+        return document
+
+    def flush(self):
+        print(json.dumps(self.document()))
+
+
+def timed(operation, method, **kwargs):
+    """
+    metrics.call on the current invocation's metrics, or a plain call outside
+    an instrumented handler
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return method(**kwargs)
+    return metrics.call(operation, method, **kwargs)
+
+
+def add_metric(name, value, unit='Count'):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(name, value, unit)
+
+
+def instrumented(service):
+    """
+    Decorator timing a Lambda handler and emitting its metrics as one EMF
+    line per invocation, tagged with whether it was a cold start
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            metrics = Metrics(service, cold_start=service not in _warm_services)
+            _warm_services.add(service)
+            token = _current.set(metrics)
+            start = metrics.clock()
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                metrics.add('HandlerLatency', (metrics.clock() - start) * 1000, 'Milliseconds')
+                if isinstance(response, dict) and 'statusCode' in response:
+                    metrics.properties['StatusCode'] = response['statusCode']
+                _current.reset(token)
+                metrics.flush()
+        return wrapper
+    return decorator
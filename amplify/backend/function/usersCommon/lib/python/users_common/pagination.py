@@ -0,0 +1,77 @@
+import base64
+import binascii
+import json
+import os
+from decimal import Decimal
+
+from users_common.metrics import timed
+from users_common.responses import dumps
+
+LIST_PAGE_SIZE = int(os.environ.get('LIST_PAGE_SIZE', '50'))
+LIST_MAX_PAGE_SIZE = int(os.environ.get('LIST_MAX_PAGE_SIZE', '100'))
+# Attributes returned by the listing; everything else stays in the table
+LIST_ATTRIBUTES = ('id', 'email', 'name')
+MAX_TOTAL_SEGMENTS = 1000000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_evaluated_key, segment=None, total_segments=None):
+    """
+    Opaque token wrapping a LastEvaluatedKey and the scan segment it belongs to
+    """
+    state = {'k': last_evaluated_key}
+    if total_segments is not None:
+        state['s'] = [segment, total_segments]
+    return base64.urlsafe_b64encode(dumps(state).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, segment=None, total_segments=None):
+    """
+    ExclusiveStartKey from a cursor token, checking it was issued for the same segment
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        state = json.loads(raw, parse_float=Decimal)
+    except (binascii.Error, ValueError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(state, dict) or not isinstance(state.get('k'), dict):
+        raise InvalidCursor('Invalid cursor')
+    expected = None if total_segments is None else [segment, total_segments]
+    if state.get('s') != expected:
+        raise InvalidCursor('Cursor does not match the requested segment')
+    return state['k']
+
+
+def projection(attributes):
+    """
+    ProjectionExpression and ExpressionAttributeNames for plain attribute names
+    """
+    names = {f'#p{i}': attribute for i, attribute in enumerate(attributes)}
+    return ', '.join(names), names
+
+
+def scan_page(table, page_size, cursor=None, segment=None, total_segments=None,
+              attributes=LIST_ATTRIBUTES):
+    """
+    Fetch one page of the table, optionally restricted to a parallel scan
+    segment. attributes=None returns whole items.
+    """
+    kwargs = {'Limit': page_size}
+    if attributes:
+        kwargs['ProjectionExpression'], kwargs['ExpressionAttributeNames'] = projection(attributes)
+    if total_segments is not None:
+        kwargs['Segment'] = segment
+        kwargs['TotalSegments'] = total_segments
+    if cursor:
+        kwargs['ExclusiveStartKey'] = decode_cursor(cursor, segment, total_segments)
+
+    response = timed('Scan', table.scan, **kwargs)
+    last_key = response.get('LastEvaluatedKey')
+    return {
+        'items': response.get('Items', []),
+        'count': response.get('Count', 0),
+        'nextCursor': encode_cursor(last_key, segment, total_segments) if last_key else None,
+    }
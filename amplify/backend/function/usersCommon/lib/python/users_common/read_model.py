@@ -0,0 +1,166 @@
+import os
+import time
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from users_common.cache import MISSING
+from users_common.metrics import timed
+
+READ_MODEL_TABLE = os.environ.get('READ_MODEL_TABLE', 'users-read-model-dev')
+READ_MODEL_ID_INDEX = 'user-id'
+# Attributes copied from the users table, what a lookup by email returns
+READ_MODEL_ATTRIBUTES = ('id', 'email', 'name')
+# Tombstones only need to outlive the 24 h stream retention; expiresAt is the table's TTL attribute
+TOMBSTONE_TTL = int(os.environ.get('READ_MODEL_TOMBSTONE_TTL', '172800'))
+# Stream sequence numbers are decimal strings of up to 40 digits
+SEQUENCE_WIDTH = 40
+
+_deserializer = TypeDeserializer()
+
+
+def sequence_key(sequence_number):
+    # Zero-padded so DynamoDB's string comparison orders them numerically
+    return sequence_number.zfill(SEQUENCE_WIDTH)
+
+
+def deserialize(image):
+    if not image:
+        return None
+    return {name: _deserializer.deserialize(value) for name, value in image.items()}
+
+
+def summary(user):
+    return {a: user[a] for a in READ_MODEL_ATTRIBUTES if a in user}
+
+
+class ReadModel:
+    """
+    Email -> minimal user projection, kept up to date from the users table
+    stream. Every write is conditional on the record's sequence number, so
+    replayed or out-of-order records never overwrite newer state; removals
+    leave a tombstone for the same reason.
+
+    The users table does not enforce unique emails. An email seen for two
+    live users is marked shared for good: lookups then go to the email index,
+    and later records for that email leave it alone.
+    """
+
+    def __init__(self, table, tombstone_ttl=TOMBSTONE_TTL, clock=time.time):
+        self.table = table
+        self.tombstone_ttl = tombstone_ttl
+        self.clock = clock
+
+    def get(self, email):
+        """
+        The user projection, None when the user was removed, or MISSING when
+        the read model knows nothing about this email or it is shared
+        """
+        item = timed('ReadModelGetItem', self.table.get_item, Key={'email': email}).get('Item')
+        if item is None or item.get('shared'):
+            return MISSING
+        if item.get('deleted'):
+            return None
+        return summary(item)
+
+    def apply(self, record):
+        """
+        Apply one stream record; returns False when it was already applied
+        """
+        change = record['dynamodb']
+        sequence = sequence_key(change['SequenceNumber'])
+        keys = deserialize(change['Keys'])
+        new = deserialize(change.get('NewImage'))
+        old = deserialize(change.get('OldImage'))
+
+        applied = False
+        if record['eventName'] in ('INSERT', 'MODIFY') and new and new.get('email'):
+            applied = self.put(new, sequence)
+            stale = self.emails_of(keys['id'], old) - {new['email']}
+        else:
+            stale = self.emails_of(keys['id'], old)
+        for email in stale:
+            applied = self.tombstone(email, keys['id'], sequence) or applied
+        return applied
+
+    def emails_of(self, user_id, old):
+        """
+        Emails currently pointing at this user. Without an old image (stream
+        view type NEW_IMAGE) they are looked up on the id index.
+        """
+        if old is not None:
+            return {old['email']} if old.get('email') else set()
+        response = timed(
+            'ReadModelQuery', self.table.query,
+            IndexName=READ_MODEL_ID_INDEX,
+            KeyConditionExpression=Key('id').eq(user_id)
+        )
+        return {item['email'] for item in response.get('Items', []) if not item.get('deleted')}
+
+    def put(self, user, sequence):
+        try:
+            timed(
+                'ReadModelPutItem', self.table.put_item,
+                Item={**summary(user), 'sequence': sequence},
+                # A different user may only take over the email once it was released
+                ConditionExpression=(
+                    'attribute_not_exists(email)'
+                    ' OR (attribute_not_exists(#shared) AND ('
+                    '(id = :id AND #sequence < :sequence) OR (id <> :id AND deleted = :true)))'
+                ),
+                ExpressionAttributeNames={'#sequence': 'sequence', '#shared': 'shared'},
+                ExpressionAttributeValues={':id': user['id'], ':sequence': sequence, ':true': True}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        return self.mark_shared(user['email'], user['id'])
+
+    def mark_shared(self, email, user_id):
+        """
+        Mark the email shared when it is held by another live user; returns
+        False when the record was simply older than the stored state
+        """
+        try:
+            timed(
+                'ReadModelUpdateItem', self.table.update_item,
+                Key={'email': email},
+                UpdateExpression='SET #shared = :true',
+                ConditionExpression=(
+                    'attribute_exists(email) AND id <> :id'
+                    ' AND attribute_not_exists(deleted) AND attribute_not_exists(#shared)'
+                ),
+                ExpressionAttributeNames={'#shared': 'shared'},
+                ExpressionAttributeValues={':id': user_id, ':true': True}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        print("Email shared by several users:", email)
+        return True
+
+    def tombstone(self, email, user_id, sequence):
+        try:
+            timed(
+                'ReadModelPutItem', self.table.put_item,
+                Item={
+                    'email': email,
+                    'id': user_id,
+                    'deleted': True,
+                    'sequence': sequence,
+                    'expiresAt': int(self.clock()) + self.tombstone_ttl
+                },
+                # Never touch an entry that now belongs to someone else, or is shared
+                ConditionExpression=(
+                    'attribute_not_exists(email)'
+                    ' OR (id = :id AND #sequence < :sequence AND attribute_not_exists(#shared))'
+                ),
+                ExpressionAttributeNames={'#sequence': 'sequence', '#shared': 'shared'},
+                ExpressionAttributeValues={':id': user_id, ':sequence': sequence}
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
@@ -0,0 +1,64 @@
+import json
+from decimal import Decimal
+from functools import lru_cache
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard encoder is the fallback
+    orjson = None
+
+# Shared by every response; built once per container and never mutated
+HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': '*',
+    'Access-Control-Allow-Methods': '*',
+}
+
+
+def _default(obj):
+    # DynamoDB returns numbers as Decimal and SS/NS attributes as sets
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+_encode = json.JSONEncoder(default=_default, ensure_ascii=False).encode
+
+
+def dumps(obj):
+    """
+    Serialize a response body to a JSON string
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default).decode()
+        except TypeError:
+            # orjson rejects integers wider than 64 bits, DynamoDB allows 38 digits
+            pass
+    return _encode(obj)
+
+
+@lru_cache(maxsize=64)
+def error_body(message):
+    """
+    Serialized {'error': message}; constant messages are only encoded once
+    """
+    return dumps({'error': message})
+
+
+def json_response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': HEADERS,
+        'body': dumps(body)
+    }
+
+
+def error_response(status_code, message):
+    return {
+        'statusCode': status_code,
+        'headers': HEADERS,
+        'body': error_body(message)
+    }
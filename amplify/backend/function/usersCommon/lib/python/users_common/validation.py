@@ -0,0 +1,35 @@
+import re
+
+# Single compiled pattern equivalent to the former step-by-step checks:
+# a 1-64 character local part without consecutive dots, then a domain of at
+# most 255 characters made of non-empty labels and an alphabetic TLD of at
+# least 2 letters. The optional newline before '@' mirrors re.match's '$',
+# which the local part check used to accept before a trailing newline.
+EMAIL_PATTERN = re.compile(r"""
+    (?=[^@]{1,64}@)
+    (?![^@]*\.\.)
+    [a-zA-Z0-9._%+-]+\n?
+    @
+    (?=[^@]{1,255}\Z)
+    (?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}
+    \Z
+""", re.VERBOSE)
+
+_match_email = EMAIL_PATTERN.match
+
+
+def is_valid_email(email):
+    """
+    Validate email format with strict rules
+    """
+    if not email:
+        return False
+    return _match_email(email) is not None
+
+
+def validate_many(emails):
+    """
+    Validate a batch of emails, returning one boolean per email in order
+    """
+    match = _match_email
+    return [bool(email) and match(email) is not None for email in emails]
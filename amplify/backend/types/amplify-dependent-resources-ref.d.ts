@@ -7,6 +7,14 @@ export type AmplifyDependentResourcesAttributes = {
     }
   },
   "function": {
+    "ExportUsersHandler": {
+      "Arn": "string",
+      "ExportBucketName": "string",
+      "LambdaExecutionRole": "string",
+      "LambdaExecutionRoleArn": "string",
+      "Name": "string",
+      "Region": "string"
+    },
     "GetUserHandler": {
       "Arn": "string",
       "LambdaExecutionRole": "string",
@@ -15,10 +23,24 @@ export type AmplifyDependentResourcesAttributes = {
       "Region": "string"
     },
     "PostUserHandler": {
+      "Arn": "string",
+      "DeadLetterQueueArn": "string",
+      "IdempotencyTableArn": "string",
+      "IdempotencyTableName": "string",
+      "LambdaExecutionRole": "string",
+      "LambdaExecutionRoleArn": "string",
+      "Name": "string",
+      "Region": "string",
+      "UserQueueArn": "string",
+      "UserQueueUrl": "string"
+    },
+    "UserStreamHandler": {
       "Arn": "string",
       "LambdaExecutionRole": "string",
       "LambdaExecutionRoleArn": "string",
       "Name": "string",
+      "ReadModelTableArn": "string",
+      "ReadModelTableName": "string",
       "Region": "string"
     }
   },
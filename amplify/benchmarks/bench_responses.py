@@ -0,0 +1,64 @@
+"""
+Compare the shared response builder against building headers and calling
+json.dumps on every response, as the handlers used to.
+
+    python amplify/benchmarks/bench_responses.py
+"""
+import json
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend', 'function', 'usersCommon', 'lib', 'python'))
+
+from users_common import responses  # noqa: E402
+from users_common.responses import error_response, json_response  # noqa: E402
+
+NUMBER = 100000
+USER = {'id': '6f1c2a52-8f5e-4f4c-9a53-0c6a3d2b8b11', 'email': 'john.doe@example.com', 'name': 'John Doe'}
+DYNAMO_USER = dict(USER, age=Decimal('42'), tags={'admin', 'beta'})
+
+
+def _legacy_default(obj):
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, set):
+        return sorted(obj)
+    raise TypeError
+
+
+def legacy_response(status_code, body):
+    headers = {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': '*',
+        'Access-Control-Allow-Methods': '*',
+    }
+    return {'statusCode': status_code, 'headers': headers, 'body': json.dumps(body, default=_legacy_default)}
+
+
+def bench(label, func):
+    seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+    per_call = seconds / NUMBER * 1e9
+    print(f"{label:<40} {per_call:8.1f} ns/response")
+    return per_call
+
+
+def main():
+    cases = [
+        ('200 user', lambda: legacy_response(200, USER), lambda: json_response(200, USER)),
+        ('200 user with Decimal and set', lambda: legacy_response(200, DYNAMO_USER),
+         lambda: json_response(200, DYNAMO_USER)),
+        ('404 constant error', lambda: legacy_response(404, {'error': 'User not found'}),
+         lambda: error_response(404, 'User not found')),
+    ]
+    print(f"orjson: {'enabled' if responses.orjson is not None else 'not installed'}")
+    for name, legacy, shared in cases:
+        before = bench(name + ' (legacy)', legacy)
+        after = bench(name + ' (shared)', shared)
+        print(f"{'':<40} saves {before - after:.1f} ns per invocation")
+
+
+if __name__ == '__main__':
+    main()
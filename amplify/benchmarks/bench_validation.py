@@ -0,0 +1,35 @@
+"""
+Compare the shared email validator against the former per-handler implementation.
+
+    python amplify/benchmarks/bench_validation.py
+"""
+import os
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'backend', 'function', 'usersCommon', 'lib', 'python'))
+sys.path.insert(0, os.path.join(HERE, '..', 'tests'))
+
+from users_common.validation import is_valid_email, validate_many  # noqa: E402
+from test_validation import EXAMPLES, legacy_is_valid_email  # noqa: E402
+
+NUMBER = 2000
+
+
+def bench(label, func):
+    seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+    per_email = seconds / (NUMBER * len(EXAMPLES)) * 1e9
+    print(f"{label:<24} {per_email:8.1f} ns/email")
+    return per_email
+
+
+def main():
+    legacy = bench('legacy is_valid_email', lambda: [legacy_is_valid_email(e) for e in EXAMPLES])
+    single = bench('is_valid_email', lambda: [is_valid_email(e) for e in EXAMPLES])
+    bulk = bench('validate_many', lambda: validate_many(EXAMPLES))
+    print(f"speedup: {legacy / single:.1f}x single, {legacy / bulk:.1f}x bulk")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+import pytest
+
+# Fake credentials so boto3 clients built outside of a moto context still sign requests
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ.setdefault('AWS_SECURITY_TOKEN', 'testing')
+os.environ.setdefault('AWS_SESSION_TOKEN', 'testing')
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+
+FUNCTION_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'function')
+
+# The usersCommon layer is mounted on /opt/python in Lambda
+sys.path.insert(0, os.path.join(FUNCTION_DIR, 'usersCommon', 'lib', 'python'))
+
+
+@pytest.fixture(autouse=True)
+def handler_module(request):
+    """
+    Every handler ships its code as a top-level `index` module. Put the src
+    directory of the handler under test first on the path and drop any
+    previously imported `index` so each test module gets its own handler.
+    """
+    from users_common.cache import user_cache
+
+    name = request.module.__name__
+    src = os.path.abspath(os.path.join(FUNCTION_DIR, name[len('test_'):], 'src'))
+    if name.startswith('test_') and os.path.isdir(src):
+        sys.path[:] = [p for p in sys.path if os.path.abspath(p) != src]
+        sys.path.insert(0, src)
+        sys.modules.pop('index', None)
+    user_cache.clear()
+    yield
+    user_cache.clear()
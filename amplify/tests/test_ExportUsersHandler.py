@@ -0,0 +1,158 @@
+import gzip
+import json
+import os
+import sys
+import boto3
+import pytest
+from moto import mock_dynamodb, mock_s3
+import uuid
+
+# Set environment variables for the lambda
+os.environ['AWS_DEFAULT_REGION'] = 'eu-west-1'
+os.environ['USERS_TABLE'] = 'users-dev'
+
+# Add the lambda source directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'function', 'ExportUsersHandler', 'src'))
+
+
+def read_ndjson(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+class FailingTable:
+    """Table wrapper whose scan fails after a number of successful pages"""
+
+    def __init__(self, table, pages):
+        self.table = table
+        self.pages = pages
+
+    def scan(self, **kwargs):
+        if self.pages == 0:
+            raise RuntimeError('connection reset')
+        self.pages -= 1
+        return self.table.scan(**kwargs)
+
+
+class TestExportUsersHandler:
+
+    def setup_method(self, method):
+        self.handler = __import__('index').handler
+
+    def setup_table(self, count=25):
+        dynamodb = boto3.resource('dynamodb', region_name='eu-west-1')
+        table = dynamodb.create_table(
+            TableName='users-dev',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        table.meta.client.get_waiter('table_exists').wait(TableName='users-dev')
+        users = [{'id': str(uuid.uuid4()), 'email': f'user{i}@example.com', 'age': i} for i in range(count)]
+        with table.batch_writer() as batch:
+            for user in users:
+                batch.put_item(Item=user)
+        return table, users
+
+    @mock_dynamodb
+    @pytest.mark.parametrize('compress', [False, True])
+    def test_export_all_segments(self, tmp_path, compress):
+        _, users = self.setup_table()
+        event = {'outputDir': str(tmp_path), 'totalSegments': 3, 'pageSize': 4, 'gzip': compress}
+        response = self.handler(event, {})
+
+        assert response['statusCode'] == 200
+        summary = json.loads(response['body'])
+        assert len(summary['files']) == 3
+        assert all(path.startswith(os.path.join(str(tmp_path), summary['exportId'])) for path in summary['files'])
+        exported = [item for path in summary['files'] for item in read_ndjson(path)]
+        assert summary['items'] == len(exported)
+        # moto < 5 ignores Segment, so segments may overlap there; DynamoDB keeps them disjoint
+        assert {u['id']: u for u in exported} == {u['id']: u for u in users}
+
+    @mock_dynamodb
+    def test_export_resumes_from_checkpoint(self, tmp_path):
+        from users_common.export import export_segment, load_checkpoint, checkpoint_path
+        table, users = self.setup_table()
+
+        with pytest.raises(RuntimeError):
+            export_segment(FailingTable(table, pages=2), str(tmp_path), 0, 1, compress=True, page_size=5)
+        checkpoint = load_checkpoint(checkpoint_path(str(tmp_path), 0, 1))
+        assert checkpoint['items'] == 10 and not checkpoint['done']
+
+        # Bytes written after the last checkpoint are dropped on resume
+        with open(os.path.join(tmp_path, 'users-0000-of-0001.ndjson.gz'), 'ab') as f:
+            f.write(b'partial page')
+
+        checkpoint = export_segment(table, str(tmp_path), 0, 1, compress=True, page_size=5)
+        assert checkpoint['done'] and checkpoint['items'] == len(users)
+        exported = read_ndjson(os.path.join(tmp_path, 'users-0000-of-0001.ndjson.gz'))
+        assert sorted(u['id'] for u in exported) == sorted(u['id'] for u in users)
+
+    @mock_dynamodb
+    def test_each_run_is_a_new_export(self, tmp_path):
+        self.setup_table(count=5)
+        event = {'outputDir': str(tmp_path), 'totalSegments': 1}
+        first = json.loads(self.handler(event, {})['body'])
+        dynamodb = boto3.resource('dynamodb', region_name='eu-west-1')
+        dynamodb.Table('users-dev').put_item(Item={'id': 'late', 'email': 'late@example.com'})
+
+        # A finished export is not returned again by the next run
+        second = json.loads(self.handler(event, {})['body'])
+        assert second['exportId'] != first['exportId']
+        assert second['items'] == 6 and len(read_ndjson(second['files'][0])) == 6
+
+        # Unless its id is passed explicitly
+        resumed = json.loads(self.handler(dict(event, exportId=first['exportId']), {})['body'])
+        assert resumed == first
+
+    def test_invalid_export_id(self, tmp_path):
+        response = self.handler({'outputDir': str(tmp_path), 'exportId': '../etc'}, {})
+        assert response['statusCode'] == 400
+
+    @mock_s3
+    @mock_dynamodb
+    def test_export_to_s3(self, tmp_path):
+        from users_common.export import S3Destination, export_table
+        table, users = self.setup_table()
+        s3 = boto3.client('s3', region_name='eu-west-1')
+        s3.create_bucket(Bucket='exports', CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'})
+        destination = S3Destination(s3, 'exports', 'users-export')
+
+        summary = export_table(lambda: table, str(tmp_path), total_segments=2, compress=True,
+                               page_size=10, export_id='nightly', destination=destination)
+        assert summary['files'] == [
+            's3://exports/users-export/nightly/users-0000-of-0002.ndjson.gz',
+            's3://exports/users-export/nightly/users-0001-of-0002.ndjson.gz'
+        ]
+        # Uploaded parts are not kept in the container's /tmp
+        assert list((tmp_path / 'nightly').iterdir()) == []
+        manifest = s3.get_object(Bucket='exports', Key='users-export/nightly/manifest.json')
+        assert json.loads(manifest['Body'].read()) == summary
+
+        exported = []
+        for s in range(2):
+            body = s3.get_object(Bucket='exports', Key=f'users-export/nightly/users-{s:04d}-of-0002.ndjson.gz')['Body']
+            exported += [json.loads(line) for line in gzip.decompress(body.read()).decode().splitlines()]
+        assert {u['id'] for u in exported} == {u['id'] for u in users}
+
+        # Resuming in a fresh container skips the segments already uploaded
+        resumed = export_table(lambda: FailingTable(table, pages=0), str(tmp_path / 'fresh'), total_segments=2,
+                               compress=True, export_id='nightly', destination=destination)
+        assert resumed == summary
+
+    @mock_dynamodb
+    def test_iter_ndjson_streams_pages(self):
+        from users_common.export import iter_ndjson
+        table, users = self.setup_table(count=7)
+        chunks = list(iter_ndjson(table, page_size=3))
+        assert len(chunks) == 3
+        lines = b''.join(chunks).decode().splitlines()
+        assert sorted(json.loads(line)['id'] for line in lines) == sorted(u['id'] for u in users)
+
+    @mock_dynamodb
+    def test_database_error_handling(self, tmp_path):
+        response = self.handler({'outputDir': str(tmp_path)}, {})
+        assert response['statusCode'] == 500
+        assert json.loads(response['body'])['error'].startswith('Database error:')
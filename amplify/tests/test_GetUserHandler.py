@@ -158,3 +158,209 @@ class TestGetUserHandler:
         returned = json.loads(response['body'])
         assert returned['email'] == 'test@example.com'
         assert returned['id'] in [test_user1['id'], test_user2['id']]
+
+    @mock_dynamodb
+    def test_cached_user_served_without_query(self, capsys):
+        table = self.setup_table()
+        test_user = {'id': str(uuid.uuid4()), 'email': 'test@example.com'}
+        table.put_item(Item=test_user)
+        event = {'queryStringParameters': {'email': 'test@example.com'}}
+        assert self.handler(event, {})['statusCode'] == 200
+
+        table.delete()
+        response = self.handler(event, {})
+        assert response['statusCode'] == 200
+        assert json.loads(response['body']) == test_user
+        out = capsys.readouterr().out
+        assert 'User cache miss: {"hits": 0, "misses": 1, "size": 0}' in out
+        assert 'User cache hit: {"hits": 1, "misses": 1, "size": 1}' in out
+
+    @mock_dynamodb
+    def test_not_found_is_negatively_cached(self):
+        table = self.setup_table()
+        event = {'queryStringParameters': {'email': 'new@example.com'}}
+        assert self.handler(event, {})['statusCode'] == 404
+
+        table.put_item(Item={'id': str(uuid.uuid4()), 'email': 'new@example.com'})
+        assert self.handler(event, {})['statusCode'] == 404
+
+        from users_common.cache import user_cache
+        user_cache.invalidate('new@example.com')
+        assert self.handler(event, {})['statusCode'] == 200
+
+    def list_event(self, **params):
+        return {'httpMethod': 'GET', 'path': '/users/list', 'queryStringParameters': params or None}
+
+    @mock_dynamodb
+    def test_list_users_paginates_with_cursor(self):
+        table = self.setup_table()
+        users = [
+            {'id': str(uuid.uuid4()), 'email': f'user{i}@example.com', 'name': f'User {i}', 'secret': 'x'}
+            for i in range(5)
+        ]
+        for user in users:
+            table.put_item(Item=user)
+
+        seen = []
+        cursor = None
+        for _ in range(3):
+            params = {'limit': '2'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.handler(self.list_event(**params), {})
+            assert response['statusCode'] == 200
+            page = json.loads(response['body'])
+            assert page['count'] == len(page['items']) <= 2
+            seen.extend(page['items'])
+            cursor = page['nextCursor']
+            if cursor is None:
+                break
+
+        assert cursor is None
+        expected = [{k: u[k] for k in ('id', 'email', 'name')} for u in users]
+        assert sorted(seen, key=lambda u: u['id']) == sorted(expected, key=lambda u: u['id'])
+
+    @mock_dynamodb
+    def test_list_users_segments_cover_table(self):
+        table = self.setup_table()
+        ids = {str(uuid.uuid4()) for _ in range(6)}
+        for user_id in ids:
+            table.put_item(Item={'id': user_id, 'email': user_id[:8] + '@example.com'})
+
+        seen = set()
+        for segment in range(3):
+            event = self.list_event(segment=str(segment), totalSegments='3', limit='100')
+            page = json.loads(self.handler(event, {})['body'])
+            seen.update(u['id'] for u in page['items'])
+        assert seen == ids
+
+    @mock_dynamodb
+    @pytest.mark.parametrize("params, error", [
+        ({'limit': '0'}, 'Limit must be between 1 and 100'),
+        ({'limit': 'ten'}, 'Limit must be between 1 and 100'),
+        ({'segment': '3', 'totalSegments': '3'}, 'Invalid segment'),
+        ({'segment': '0'}, 'Invalid segment'),
+        ({'cursor': 'not-a-cursor'}, 'Invalid cursor'),
+    ])
+    def test_list_users_invalid_parameters(self, params, error):
+        self.setup_table()
+        response = self.handler(self.list_event(**params), {})
+        assert response['statusCode'] == 400
+        assert json.loads(response['body']) == {'error': error}
+
+    @mock_dynamodb
+    def test_list_users_not_served_through_api_gateway(self):
+        table = self.setup_table()
+        table.put_item(Item={'id': str(uuid.uuid4()), 'email': 'user@example.com'})
+        event = dict(self.list_event(limit='10'), requestContext={'stage': 'dev', 'path': '/dev/users/list'})
+        response = self.handler(event, {})
+        assert response['statusCode'] == 403
+        assert 'items' not in json.loads(response['body'])
+
+    @mock_dynamodb
+    def test_get_user_selected_fields(self):
+        table = self.setup_table()
+        test_user = {'id': str(uuid.uuid4()), 'email': 'test@example.com', 'name': 'Test', 'bio': 'x' * 500}
+        table.put_item(Item=test_user)
+
+        event = {'queryStringParameters': {'email': 'test@example.com', 'fields': 'id, name,id,missing'}}
+        response = self.handler(event, {})
+        assert response['statusCode'] == 200
+        assert json.loads(response['body']) == {'id': test_user['id'], 'name': 'Test'}
+
+        # Partial items are not cached, a full lookup still returns everything
+        event = {'queryStringParameters': {'email': 'test@example.com'}}
+        assert json.loads(self.handler(event, {})['body']) == test_user
+
+        # Cached full items are projected in memory
+        table.delete()
+        event = {'queryStringParameters': {'email': 'test@example.com', 'fields': 'email'}}
+        assert json.loads(self.handler(event, {})['body']) == {'email': 'test@example.com'}
+
+    @mock_dynamodb
+    @pytest.mark.parametrize("fields", ['id,#name', 'id;name', '1id', ','.join(f'f{i}' for i in range(21))])
+    def test_get_user_invalid_fields(self, fields):
+        self.setup_table()
+        event = {'queryStringParameters': {'email': 'test@example.com', 'fields': fields}}
+        response = self.handler(event, {})
+        assert response['statusCode'] == 400
+        assert json.loads(response['body']) == {'error': 'Invalid fields parameter'}
+
+    @mock_dynamodb
+    def test_user_exists_check(self):
+        table = self.setup_table()
+        table.put_item(Item={'id': str(uuid.uuid4()), 'email': 'test@example.com'})
+
+        for email, exists in [('test@example.com', True), ('other@example.com', False)]:
+            event = {'queryStringParameters': {'email': email, 'exists': 'true'}}
+            response = self.handler(event, {})
+            assert response['statusCode'] == 200
+            assert json.loads(response['body']) == {'exists': exists}
+
+        # The negative answer is cached like a 404
+        event = {'queryStringParameters': {'email': 'other@example.com'}}
+        assert self.handler(event, {})['statusCode'] == 404
+
+    @mock_dynamodb
+    def test_emits_embedded_metrics(self, capsys):
+        table = self.setup_table()
+        table.put_item(Item={'id': str(uuid.uuid4()), 'email': 'test@example.com'})
+        event = {'queryStringParameters': {'email': 'test@example.com'}}
+        self.handler(event, {})
+
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+        assert len(lines) == 1
+        emf = lines[0]
+        assert emf['Service'] == 'GetUserHandler'
+        assert emf['StatusCode'] == 200
+        assert emf['UserCacheMiss'] == 1
+        assert emf['QueryLatency'] >= 0 and emf['HandlerLatency'] >= emf['QueryLatency']
+        names = {m['Name'] for m in emf['_aws']['CloudWatchMetrics'][0]['Metrics']}
+        assert {'QueryLatency', 'HandlerLatency', 'UserCacheMiss'} <= names
+
+    @mock_dynamodb
+    def test_lookup_served_from_read_model(self, monkeypatch):
+        from users_common.read_model import ReadModel
+
+        table = self.setup_table()
+        table.put_item(Item={'id': 'u-3', 'email': 'legacy@example.com'})
+        dynamodb = boto3.resource('dynamodb', region_name='eu-west-1')
+        read_table = dynamodb.create_table(
+            TableName='users-read-model-dev',
+            KeySchema=[{'AttributeName': 'email', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'email', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        read_table.put_item(Item={'email': 'test@example.com', 'id': 'u-1', 'name': 'Test', 'sequence': '1'})
+        read_table.put_item(Item={'email': 'gone@example.com', 'id': 'u-2', 'deleted': True, 'sequence': '2'})
+        read_table.put_item(Item={'email': 'shared@example.com', 'id': 'u-4', 'shared': True, 'sequence': '3'})
+        monkeypatch.setattr(sys.modules[self.handler.__module__], 'read_model', ReadModel(read_table))
+
+        # Only in the read model: the email index is not queried
+        event = {'queryStringParameters': {'email': 'test@example.com', 'fields': 'id,name'}}
+        response = self.handler(event, {})
+        assert response['statusCode'] == 200
+        assert json.loads(response['body']) == {'id': 'u-1', 'name': 'Test'}
+
+        response = self.handler({'queryStringParameters': {'email': 'gone@example.com', 'exists': 'true'}}, {})
+        assert json.loads(response['body']) == {'exists': False}
+
+        # Users the stream consumer has not seen yet fall back to the email index
+        response = self.handler({'queryStringParameters': {'email': 'legacy@example.com'}}, {})
+        assert response['statusCode'] == 200
+        assert json.loads(response['body'])['id'] == 'u-3'
+
+        # Emails held by several users are answered by the email index too
+        response = self.handler({'queryStringParameters': {'email': 'shared@example.com'}}, {})
+        assert response['statusCode'] == 404
+
+        # Full-item lookups never get the summary, nor cache it for later requests
+        full = {'id': 'u-5', 'email': 'full@example.com', 'name': 'Full', 'bio': 'x'}
+        table.put_item(Item=full)
+        read_table.put_item(Item={'email': 'full@example.com', 'id': 'u-5', 'name': 'Full', 'sequence': '4'})
+        event = {'queryStringParameters': {'email': 'full@example.com', 'fields': 'name'}}
+        assert json.loads(self.handler(event, {})['body']) == {'name': 'Full'}
+        response = self.handler({'queryStringParameters': {'email': 'full@example.com'}}, {})
+        assert json.loads(response['body']) == full
+        event = {'queryStringParameters': {'email': 'full@example.com', 'fields': 'bio'}}
+        assert json.loads(self.handler(event, {})['body']) == {'bio': 'x'}
@@ -379,6 +379,226 @@ class TestPostUserHandler:
         body = json.loads(response['body'])
         assert body['email'] == 'test@example.com'  # Should be trimmed
 
+    @mock_dynamodb
+    def test_created_user_primes_lookup_cache(self):
+        """Test that a created user is primed in the shared lookup cache"""
+        self.setup_table()
+        from index import handler
+        from users_common.cache import user_cache
+
+        user_cache.put_missing('test@example.com')
+        event = {'httpMethod': 'POST', 'body': json.dumps({'email': 'test@example.com'})}
+        response = handler(event, {})
+
+        assert response['statusCode'] == 201
+        assert user_cache.get('test@example.com') == json.loads(response['body'])
+
+    def sqs_event(self, bodies):
+        return {'Records': [
+            {'messageId': f'msg-{i}', 'eventSource': 'aws:sqs', 'body': body}
+            for i, body in enumerate(bodies)
+        ]}
+
+    @mock_dynamodb
+    def test_sqs_batch_creates_users(self):
+        """Test that a batch of SQS messages creates every valid user"""
+        self.table = self.setup_table()
+        from index import handler
+
+        bodies = [json.dumps({'email': f'user{i}@example.com', 'name': f'User {i}'}) for i in range(30)]
+        response = handler(self.sqs_event(bodies), {})
+
+        assert response == {'batchItemFailures': []}
+        items = self.table.scan()['Items']
+        assert sorted(item['email'] for item in items) == sorted(f'user{i}@example.com' for i in range(30))
+
+    @mock_dynamodb
+    def test_sqs_batch_drops_invalid_and_duplicate_messages(self):
+        """Test that messages that can never succeed are not retried"""
+        self.table = self.setup_table()
+        from index import handler
+
+        self.table.put_item(Item={'id': str(uuid.uuid4()), 'email': 'existing@example.com'})
+        bodies = [
+            json.dumps({'email': 'new@example.com'}),
+            json.dumps({'email': 'new@example.com', 'name': 'Again'}),
+            json.dumps({'email': 'existing@example.com'}),
+            json.dumps({'email': 'bad@email'}),
+            json.dumps({'email': 'long@example.com', 'name': 'A' * 101}),
+            'invalid json',
+            json.dumps(['not', 'an', 'object']),
+        ]
+        response = handler(self.sqs_event(bodies), {})
+
+        assert response == {'batchItemFailures': []}
+        emails = sorted(item['email'] for item in self.table.scan()['Items'])
+        assert emails == ['existing@example.com', 'new@example.com']
+
+    @mock_dynamodb
+    def test_sqs_batch_reports_unprocessed_items(self, monkeypatch):
+        """Test that only the messages DynamoDB did not write are reported"""
+        self.setup_table()
+        import index
+
+        real_batch_write_item = index.dynamodb.batch_write_item
+
+        def partial_batch_write_item(RequestItems, **kwargs):
+            requests = RequestItems['users-dev']
+            real_batch_write_item(RequestItems={'users-dev': requests[1:]}, **kwargs)
+            return {'UnprocessedItems': {'users-dev': requests[:1]}}
+
+        monkeypatch.setattr(index.dynamodb, 'batch_write_item', partial_batch_write_item)
+        bodies = [json.dumps({'email': f'user{i}@example.com'}) for i in range(3)]
+        response = index.handler(self.sqs_event(bodies), {})
+
+        assert response == {'batchItemFailures': [{'itemIdentifier': 'msg-0'}]}
+
+    @mock_dynamodb
+    def test_sqs_batch_database_error_fails_every_message(self):
+        """Test that DynamoDB errors mark the affected messages as failed"""
+        self.table = self.setup_table()
+        self.table.delete()
+        from index import handler
+
+        bodies = [json.dumps({'email': f'user{i}@example.com'}) for i in range(2)]
+        response = handler(self.sqs_event(bodies), {})
+
+        assert response == {'batchItemFailures': [
+            {'itemIdentifier': 'msg-0'}, {'itemIdentifier': 'msg-1'}
+        ]}
+
+    def template_resources(self):
+        path = os.path.join(os.path.dirname(__file__), '..', 'backend', 'function', 'PostUserHandler',
+                            'PostUserHandler-cloudformation-template.json')
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['Resources']
+
+    def test_sqs_mapping_reports_batch_item_failures(self):
+        """Test that the stack's queue mapping honours batchItemFailures"""
+        resources = self.template_resources()
+        mapping = resources['LambdaEventSourceMappingsqs']['Properties']
+        assert mapping['EventSourceArn'] == {'Fn::GetAtt': ['UserQueue', 'Arn']}
+        assert mapping['FunctionResponseTypes'] == ['ReportBatchItemFailures']
+        assert 'deadLetterTargetArn' in resources['UserQueue']['Properties']['RedrivePolicy']
+
+    def test_idempotency_table_granted_on_its_arn(self):
+        """Test that the idempotency store's calls are granted on the stack's table only"""
+        statements = self.template_resources()['AmplifyResourcesPolicy']['Properties']['PolicyDocument']['Statement']
+        granted = [s for s in statements if s['Resource'] == [{'Fn::GetAtt': ['IdempotencyTable', 'Arn']}]]
+        assert len(granted) == 1
+        assert set(granted[0]['Action']) == {
+            'dynamodb:GetItem', 'dynamodb:PutItem', 'dynamodb:UpdateItem', 'dynamodb:DeleteItem'
+        }
+
+    def setup_idempotency_table(self):
+        """Helper to create the mock DynamoDB idempotency table"""
+        dynamodb = boto3.resource('dynamodb', region_name='eu-west-1')
+        table = dynamodb.create_table(
+            TableName='idempotency-dev',
+            KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        table.meta.client.get_waiter('table_exists').wait(TableName='idempotency-dev')
+        return table
+
+    def idempotent_event(self, key, payload):
+        return {
+            'httpMethod': 'POST',
+            'headers': {'Content-Type': 'application/json', 'idempotency-key': key},
+            'body': json.dumps(payload)
+        }
+
+    @mock_dynamodb
+    def test_idempotent_replay_returns_first_response(self):
+        """Test that a retried request replays the stored 201 without touching the users table"""
+        self.table = self.setup_table()
+        self.setup_idempotency_table()
+        from index import handler
+
+        event = self.idempotent_event('key-1', {'email': 'test@example.com'})
+        first = handler(event, {})
+        assert first['statusCode'] == 201
+
+        # The users table is no longer reachable, the replay must not need it
+        self.table.delete()
+        replay = handler(event, {})
+        assert replay['statusCode'] == 201
+        assert replay['body'] == first['body']
+        assert replay['headers']['Access-Control-Allow-Origin'] == '*'
+
+    @mock_dynamodb
+    def test_idempotency_key_in_progress(self):
+        """Test that a concurrent duplicate does not create the user twice"""
+        self.table = self.setup_table()
+        idempotency_table = self.setup_idempotency_table()
+        from index import handler
+        from users_common.idempotency import request_hash
+
+        event = self.idempotent_event('key-1', {'email': 'test@example.com'})
+        idempotency_table.put_item(Item={
+            'id': 'key-1', 'status': 'IN_PROGRESS', 'requestHash': request_hash(event['body']),
+            'lockExpiresAt': 2 ** 40, 'expiresAt': 2 ** 40
+        })
+
+        response = handler(event, {})
+        assert response['statusCode'] == 409
+        assert json.loads(response['body']) == {
+            'error': 'A request with this Idempotency-Key is already in progress'
+        }
+        assert self.table.scan()['Count'] == 0
+
+    @mock_dynamodb
+    def test_idempotency_key_reused_for_other_request(self):
+        """Test that a key cannot be replayed for a different payload"""
+        self.setup_table()
+        self.setup_idempotency_table()
+        from index import handler
+
+        assert handler(self.idempotent_event('key-1', {'email': 'a@example.com'}), {})['statusCode'] == 201
+        response = handler(self.idempotent_event('key-1', {'email': 'b@example.com'}), {})
+        assert response['statusCode'] == 422
+
+    @mock_dynamodb
+    def test_idempotency_key_released_after_error(self):
+        """Test that a failed request can be retried with the same key"""
+        self.setup_table()
+        idempotency_table = self.setup_idempotency_table()
+        from index import handler
+
+        event = {'httpMethod': 'POST', 'headers': {'Idempotency-Key': 'key-1'}, 'body': 'invalid json'}
+        assert handler(event, {})['statusCode'] == 400
+        assert 'Item' not in idempotency_table.get_item(Key={'id': 'key-1'})
+
+        response = handler(self.idempotent_event('key-1', {'email': 'test@example.com'}), {})
+        assert response['statusCode'] == 201
+        assert idempotency_table.get_item(Key={'id': 'key-1'})['Item']['status'] == 'COMPLETED'
+
+    @mock_dynamodb
+    def test_idempotency_expired_lock_is_reclaimed(self):
+        """Test that a request abandoned mid-flight does not block retries forever"""
+        self.setup_table()
+        idempotency_table = self.setup_idempotency_table()
+        from index import handler
+        from users_common.idempotency import request_hash
+
+        event = self.idempotent_event('key-1', {'email': 'test@example.com'})
+        idempotency_table.put_item(Item={
+            'id': 'key-1', 'status': 'IN_PROGRESS', 'requestHash': request_hash(event['body']),
+            'lockExpiresAt': 0, 'expiresAt': 2 ** 40
+        })
+        assert handler(event, {})['statusCode'] == 201
+
+    @mock_dynamodb
+    def test_idempotency_key_too_long(self):
+        """Test Idempotency-Key length validation"""
+        self.setup_table()
+        from index import handler
+
+        response = handler(self.idempotent_event('k' * 256, {'email': 'test@example.com'}), {})
+        assert response['statusCode'] == 400
+        assert json.loads(response['body']) == {'error': 'Idempotency-Key must be at most 255 characters'}
+
 # Test fixtures for common test data
 @pytest.fixture
 def valid_create_user_event():
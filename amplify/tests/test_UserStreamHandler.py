@@ -0,0 +1,191 @@
+import json
+import os
+import boto3
+import pytest
+from moto import mock_dynamodb
+from users_common.cache import MISSING
+from users_common.read_model import ReadModel, sequence_key
+
+READ_MODEL_TABLE = 'users-read-model-dev'
+FUNCTIONS_DIR = os.path.join(os.path.dirname(__file__), '..', 'backend', 'function')
+# boto3 Table methods used by ReadModel -> IAM action they need
+ACTIONS = {'get_item': 'dynamodb:GetItem', 'put_item': 'dynamodb:PutItem',
+           'update_item': 'dynamodb:UpdateItem', 'query': 'dynamodb:Query'}
+
+
+def create_read_model_table():
+    dynamodb = boto3.resource('dynamodb', region_name='eu-west-1')
+    table = dynamodb.create_table(
+        TableName=READ_MODEL_TABLE,
+        KeySchema=[{'AttributeName': 'email', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'email', 'AttributeType': 'S'},
+            {'AttributeName': 'id', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'user-id',
+            'KeySchema': [{'AttributeName': 'id', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.meta.client.get_waiter('table_exists').wait(TableName=READ_MODEL_TABLE)
+    return table
+
+
+def image(user):
+    return {name: {'S': value} for name, value in user.items()}
+
+
+def record(event_name, sequence, user_id, new=None, old=None):
+    change = {
+        'Keys': {'id': {'S': user_id}},
+        'SequenceNumber': str(sequence),
+        'StreamViewType': 'NEW_AND_OLD_IMAGES' if old else 'NEW_IMAGE'
+    }
+    if new:
+        change['NewImage'] = image(new)
+    if old:
+        change['OldImage'] = image(old)
+    return {'eventID': str(sequence), 'eventName': event_name, 'eventSource': 'aws:dynamodb', 'dynamodb': change}
+
+
+JOHN = {'id': 'u-1', 'email': 'john@example.com', 'name': 'John'}
+
+
+@pytest.fixture
+def read_model():
+    with mock_dynamodb():
+        table = create_read_model_table()
+        import index
+        index.read_model = ReadModel(table)
+        yield index.read_model
+
+
+def handle(*records):
+    import index
+    return index.handler({'Records': list(records)}, {})
+
+
+def test_sequence_key_orders_numerically():
+    assert sequence_key('900') < sequence_key('1000')
+    assert len(sequence_key('1' * 40)) == 40
+
+
+def test_insert_and_replay(read_model):
+    assert handle(record('INSERT', 100, 'u-1', JOHN)) == {'batchItemFailures': []}
+    assert read_model.get('john@example.com') == JOHN
+    assert read_model.get('nobody@example.com') is MISSING
+
+    renamed = dict(JOHN, name='Johnny')
+    handle(record('MODIFY', 200, 'u-1', renamed, JOHN))
+    # Redelivered older records do not overwrite newer state
+    assert handle(record('INSERT', 100, 'u-1', JOHN), record('MODIFY', 200, 'u-1', renamed, JOHN)) == {
+        'batchItemFailures': []
+    }
+    assert read_model.get('john@example.com') == renamed
+
+
+def test_email_change_without_old_image(read_model):
+    moved = dict(JOHN, email='john.doe@example.com')
+    handle(record('INSERT', 100, 'u-1', JOHN), record('MODIFY', 200, 'u-1', moved))
+    assert read_model.get('john.doe@example.com') == moved
+    assert read_model.get('john@example.com') is None
+
+
+def test_remove_leaves_tombstone(read_model):
+    handle(record('INSERT', 100, 'u-1', JOHN), record('REMOVE', 200, 'u-1'))
+    assert read_model.get('john@example.com') is None
+    # A replayed insert cannot resurrect the removed user
+    handle(record('INSERT', 100, 'u-1', JOHN))
+    assert read_model.get('john@example.com') is None
+
+
+def test_email_released_then_taken_over(read_model):
+    jane = {'id': 'u-2', 'email': 'john@example.com', 'name': 'Jane'}
+    handle(record('INSERT', 100, 'u-1', JOHN), record('REMOVE', 200, 'u-1'))
+    assert handle(record('INSERT', 500, 'u-2', jane)) == {'batchItemFailures': []}
+    assert read_model.get('john@example.com') == jane
+
+
+def test_email_shared_by_two_live_users(read_model):
+    jane = {'id': 'u-2', 'email': 'john@example.com', 'name': 'Jane'}
+    other = {'id': 'u-3', 'email': 'other@example.com'}
+    handle(record('INSERT', 100, 'u-1', JOHN))
+
+    # Duplicate emails are a lasting state of the users table, not a retryable error
+    response = handle(record('INSERT', 101, 'u-2', jane), record('INSERT', 102, 'u-3', other))
+    assert response == {'batchItemFailures': []}
+    assert read_model.get('other@example.com') == other
+    # Shared emails are looked up on the email index instead
+    assert read_model.get('john@example.com') is MISSING
+
+    # Later records for either user leave the shared entry alone
+    assert handle(
+        record('INSERT', 101, 'u-2', jane),
+        record('MODIFY', 300, 'u-1', dict(JOHN, name='Johnny'), JOHN),
+        record('REMOVE', 400, 'u-2', old=jane)
+    ) == {'batchItemFailures': []}
+    assert read_model.get('john@example.com') is MISSING
+
+
+def test_database_error_reports_first_failed_record(read_model):
+    read_model.table.delete()
+    response = handle(record('INSERT', 100, 'u-1', JOHN), record('INSERT', 101, 'u-2', JOHN))
+    assert response == {'batchItemFailures': [{'itemIdentifier': '100'}]}
+
+
+def test_malformed_record_is_dropped(read_model, capsys):
+    response = handle({'eventID': 'broken', 'eventName': 'INSERT'}, record('INSERT', 100, 'u-1', JOHN))
+    assert response == {'batchItemFailures': []}
+    assert read_model.get('john@example.com') == JOHN
+    assert 'Dropping malformed stream record: broken' in capsys.readouterr().out
+
+
+class RecordingTable:
+    """Table wrapper recording which DynamoDB actions are called"""
+
+    def __init__(self, table):
+        self.table = table
+        self.actions = set()
+
+    def __getattr__(self, name):
+        if name in ACTIONS:
+            self.actions.add(ACTIONS[name])
+        return getattr(self.table, name)
+
+
+def granted_actions(function, resource):
+    """Actions granted in a function's template on statements naming this resource"""
+    path = os.path.join(FUNCTIONS_DIR, function, f'{function}-cloudformation-template.json')
+    with open(path, encoding='utf-8') as f:
+        template = json.load(f)
+    actions = set()
+    for policy in template['Resources'].values():
+        if policy['Type'] != 'AWS::IAM::Policy':
+            continue
+        for statement in policy['Properties']['PolicyDocument']['Statement']:
+            if resource in json.dumps(statement['Resource']):
+                actions.update(statement['Action'])
+    return actions
+
+
+def test_read_model_policies_cover_calls(read_model):
+    import index
+    recording = index.read_model = ReadModel(RecordingTable(read_model.table))
+    jane = {'id': 'u-2', 'email': 'john@example.com', 'name': 'Jane'}
+    handle(
+        record('INSERT', 100, 'u-1', JOHN),
+        record('MODIFY', 200, 'u-1', dict(JOHN, name='Johnny')),
+        record('INSERT', 300, 'u-2', jane),
+        record('REMOVE', 400, 'u-3', old={'id': 'u-3', 'email': 'gone@example.com'})
+    )
+    # Every write path ran, including marking an email shared
+    assert recording.table.actions == {'dynamodb:PutItem', 'dynamodb:UpdateItem', 'dynamodb:Query'}
+    assert recording.table.actions <= granted_actions('UserStreamHandler', 'ReadModelTable')
+
+    # GetUserHandler only reads it
+    lookups = RecordingTable(read_model.table)
+    ReadModel(lookups).get('john@example.com')
+    assert lookups.actions == {'dynamodb:GetItem'}
+    assert lookups.actions <= granted_actions('GetUserHandler', 'functionUserStreamHandlerReadModelTableArn')
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import boto3
+import pytest
+from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+from users_common.aws import client_config, dynamodb_resource
+
+
+class DelayedDynamoDB(ThreadingHTTPServer):
+    """DynamoDB stand-in answering empty queries, the first `slow` of them after `delay` seconds"""
+    daemon_threads = True
+
+    def __init__(self, delay, slow):
+        super().__init__(('127.0.0.1', 0), DelayedHandler)
+        self.delay = delay
+        self.slow = slow
+        self.requests = 0
+        self.lock = threading.Lock()
+
+
+class DelayedHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.requests += 1
+            slow = self.server.requests <= self.server.slow
+        if slow:
+            time.sleep(self.server.delay)
+        body = json.dumps({'Count': 0, 'Items': [], 'ScannedCount': 0}).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-amz-json-1.0')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # the client already gave up on this attempt
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def delayed_endpoint(request):
+    delay, slow = request.param
+    server = DelayedDynamoDB(delay, slow)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+
+
+def timed_query(endpoint_url, **config):
+    table = dynamodb_resource(endpoint_url=endpoint_url, **config).Table('users-dev')
+    start = time.perf_counter()
+    try:
+        table.query(
+            IndexName='email',
+            KeyConditionExpression='email = :email',
+            ExpressionAttributeValues={':email': 'test@example.com'}
+        )
+        return time.perf_counter() - start, None
+    except (ConnectTimeoutError, ReadTimeoutError) as e:
+        return time.perf_counter() - start, e
+
+
+def test_config_from_environment():
+    config = client_config({
+        'DYNAMODB_CONNECT_TIMEOUT': '0.5',
+        'DYNAMODB_READ_TIMEOUT': '1.5',
+        'DYNAMODB_MAX_ATTEMPTS': '4',
+        'DYNAMODB_RETRY_MODE': 'standard',
+        'DYNAMODB_MAX_POOL_CONNECTIONS': '50',
+        'DYNAMODB_TCP_KEEPALIVE': 'false',
+    })
+    assert config.connect_timeout == 0.5
+    assert config.read_timeout == 1.5
+    assert config.retries == {'mode': 'standard', 'total_max_attempts': 4}
+    assert config.max_pool_connections == 50
+    assert config.tcp_keepalive is False
+
+
+def test_config_defaults_and_overrides():
+    config = client_config({}, max_pool_connections=100)
+    assert config.retries == {'mode': 'adaptive', 'total_max_attempts': 3}
+    assert (config.connect_timeout, config.read_timeout) == (1.0, 2.0)
+    assert config.max_pool_connections == 100
+    assert config.tcp_keepalive is True
+
+
+def test_resource_built_from_given_session():
+    sessions = []
+
+    class Session(boto3.session.Session):
+        def resource(self, *args, **kwargs):
+            sessions.append(self)
+            return super().resource(*args, **kwargs)
+
+    session = Session(region_name='eu-west-1')
+    resource = dynamodb_resource(session=session, read_timeout=5)
+    assert sessions == [session]
+    assert resource.meta.client.meta.config.read_timeout == 5
+
+
+@pytest.mark.parametrize('delayed_endpoint', [(3, 1)], indirect=True)
+def test_slow_attempt_is_retried_before_it_completes(delayed_endpoint):
+    server, endpoint_url = delayed_endpoint
+    elapsed, error = timed_query(endpoint_url, read_timeout=0.2, retries={'mode': 'adaptive', 'total_max_attempts': 3})
+    assert error is None
+    # The stuck first attempt is abandoned after 0.2 s (plus at most 1 s of
+    # retry backoff) instead of waiting the full 3 s
+    assert elapsed < 2.5
+    assert server.requests == 2
+
+
+@pytest.mark.parametrize('delayed_endpoint', [(3, 100)], indirect=True)
+def test_unresponsive_endpoint_fails_within_budget(delayed_endpoint):
+    server, endpoint_url = delayed_endpoint
+    elapsed, error = timed_query(endpoint_url, read_timeout=0.2, retries={'mode': 'adaptive', 'total_max_attempts': 2})
+    assert error is not None
+    # Bounded by attempts x read timeout plus backoff, far below the 25 s Lambda timeout
+    assert elapsed < 2.5
+    assert server.requests == 2
@@ -0,0 +1,67 @@
+import pytest
+from users_common.cache import MISSING, UserCache, normalize_email
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_normalize_email_keeps_case():
+    assert normalize_email('  Test@Example.com ') == 'Test@Example.com'
+    assert normalize_email(None) == ''
+
+
+def test_hit_and_miss_counters(clock):
+    cache = UserCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+    user = {'id': '1', 'email': 'a@example.com'}
+    assert cache.get('a@example.com') is MISSING
+    cache.put(' a@example.com ', user)
+    assert cache.get('a@example.com') == user
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_positive_and_negative_ttl(clock):
+    cache = UserCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+    cache.put('a@example.com', {'id': '1'})
+    cache.put_missing('b@example.com')
+    assert cache.get('b@example.com') is None
+
+    clock.now = 10
+    assert cache.get('b@example.com') is MISSING
+    assert cache.get('a@example.com') == {'id': '1'}
+
+    clock.now = 60
+    assert cache.get('a@example.com') is MISSING
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = UserCache(max_entries=2, ttl=60, negative_ttl=10, clock=clock)
+    cache.put('a@example.com', {'id': 'a'})
+    cache.put('b@example.com', {'id': 'b'})
+    cache.get('a@example.com')
+    cache.put('c@example.com', {'id': 'c'})
+    assert cache.get('b@example.com') is MISSING
+    assert cache.get('a@example.com') == {'id': 'a'}
+    assert cache.get('c@example.com') == {'id': 'c'}
+
+
+def test_invalidate_and_disabled_cache(clock):
+    cache = UserCache(max_entries=10, ttl=60, negative_ttl=10, clock=clock)
+    cache.put('a@example.com', {'id': 'a'})
+    cache.invalidate('a@example.com')
+    assert cache.get('a@example.com') is MISSING
+
+    disabled = UserCache(max_entries=0, ttl=60, negative_ttl=10, clock=clock)
+    disabled.put('a@example.com', {'id': 'a'})
+    assert disabled.get('a@example.com') is MISSING
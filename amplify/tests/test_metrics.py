@@ -0,0 +1,89 @@
+import json
+import pytest
+from users_common import metrics
+from users_common.metrics import Metrics, add_metric, instrumented, timed
+
+
+def emf_lines(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"_aws"')]
+
+
+class FakeClock:
+
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+
+    def __call__(self):
+        self.now += self.step
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def cold_container(monkeypatch):
+    monkeypatch.setattr(metrics, '_warm_services', set())
+
+
+def test_call_records_latency_and_capacity():
+    m = Metrics('svc', cold_start=False, clock=FakeClock(0.005))
+    calls = []
+
+    def query(**kwargs):
+        calls.append(kwargs)
+        return {'Count': 1, 'ConsumedCapacity': {'TableName': 'users-dev', 'CapacityUnits': 0.5}}
+
+    assert m.call('Query', query, IndexName='email') == {
+        'Count': 1, 'ConsumedCapacity': {'TableName': 'users-dev', 'CapacityUnits': 0.5}
+    }
+    assert calls == [{'IndexName': 'email', 'ReturnConsumedCapacity': 'TOTAL'}]
+
+    doc = m.document(timestamp=1.5)
+    assert doc['_aws']['Timestamp'] == 1500
+    assert doc['_aws']['CloudWatchMetrics'][0]['Metrics'] == [
+        {'Name': 'QueryLatency', 'Unit': 'Milliseconds'},
+        {'Name': 'QueryConsumedCapacity', 'Unit': 'Count'},
+    ]
+    assert doc['QueryLatency'] == pytest.approx(5.0)
+    assert doc['QueryConsumedCapacity'] == 0.5
+
+
+def test_call_sums_batch_capacity_and_times_failures():
+    m = Metrics('svc', cold_start=False, clock=FakeClock(0.001))
+    m.call('BatchWriteItem', lambda **kwargs: {'ConsumedCapacity': [
+        {'TableName': 'a', 'CapacityUnits': 2.0}, {'TableName': 'b', 'CapacityUnits': 3.0}
+    ]})
+
+    def failing(**kwargs):
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        m.call('PutItem', failing)
+    doc = m.document()
+    assert doc['BatchWriteItemConsumedCapacity'] == 5.0
+    assert 'PutItemLatency' in doc and 'PutItemConsumedCapacity' not in doc
+
+
+def test_instrumented_handler_emits_emf(capsys):
+    @instrumented('TestHandler')
+    def handler(event, context):
+        timed('Query', lambda **kwargs: {'Count': 0})
+        add_metric('UserCacheMiss', 1)
+        return {'statusCode': 404}
+
+    handler({}, {})
+    handler({}, {})
+    cold, warm = emf_lines(capsys.readouterr().out)
+
+    assert cold['ColdStart'] == 'true' and warm['ColdStart'] == 'false'
+    assert cold['Service'] == 'TestHandler'
+    assert cold['StatusCode'] == 404
+    assert cold['UserCacheMiss'] == 1
+    assert {'QueryLatency', 'HandlerLatency'} <= set(cold)
+    directive = cold['_aws']['CloudWatchMetrics'][0]
+    assert directive['Dimensions'] == [['Service'], ['Service', 'ColdStart']]
+    assert {m['Name'] for m in directive['Metrics']} == {'QueryLatency', 'UserCacheMiss', 'HandlerLatency'}
+
+
+def test_timed_outside_handler_is_a_plain_call():
+    assert timed('Query', lambda **kwargs: kwargs, Limit=1) == {'Limit': 1}
+    add_metric('Ignored', 1)
@@ -0,0 +1,29 @@
+from decimal import Decimal
+import pytest
+from users_common.pagination import InvalidCursor, decode_cursor, encode_cursor, projection
+
+
+def test_cursor_round_trip():
+    key = {'id': 'abc', 'version': Decimal('3')}
+    token = encode_cursor(key)
+    assert '=' not in token
+    assert decode_cursor(token) == key
+
+
+def test_cursor_is_bound_to_its_segment():
+    token = encode_cursor({'id': 'abc'}, segment=1, total_segments=4)
+    assert decode_cursor(token, 1, 4) == {'id': 'abc'}
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, 2, 4)
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+@pytest.mark.parametrize('token', ['', 'garbage', encode_cursor({'id': 'a'})[:-3], 'W10'])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_projection_uses_placeholders():
+    assert projection(('id', 'name')) == ('#p0, #p1', {'#p0': 'id', '#p1': 'name'})
@@ -0,0 +1,50 @@
+import json
+from decimal import Decimal
+import pytest
+from users_common import responses
+from users_common.responses import HEADERS, dumps, error_body, error_response, json_response
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def encoder(request, monkeypatch):
+    if request.param == 'orjson':
+        if responses.orjson is None:
+            pytest.skip('orjson is not installed')
+    else:
+        monkeypatch.setattr(responses, 'orjson', None)
+    return request.param
+
+
+def test_dumps_dynamodb_types(encoder):
+    item = {
+        'id': 'abc',
+        'age': Decimal('42'),
+        'score': Decimal('1.5'),
+        'tags': {'b', 'a'},
+        'name': 'Élodie',
+    }
+    assert json.loads(dumps(item)) == {
+        'id': 'abc', 'age': 42, 'score': 1.5, 'tags': ['a', 'b'], 'name': 'Élodie'
+    }
+
+
+def test_dumps_wide_integers(encoder):
+    big = Decimal('12345678901234567890123456789012345678')
+    assert json.loads(dumps({'n': big})) == {'n': int(big)}
+
+
+def test_dumps_rejects_unknown_types(encoder):
+    with pytest.raises(TypeError):
+        dumps({'value': object()})
+
+
+def test_responses_share_static_headers():
+    ok = json_response(200, {'id': '1'})
+    error = error_response(404, 'User not found')
+    assert ok['headers'] is HEADERS and error['headers'] is HEADERS
+    assert ok == {'statusCode': 200, 'headers': HEADERS, 'body': dumps({'id': '1'})}
+    assert json.loads(error['body']) == {'error': 'User not found'}
+
+
+def test_error_body_is_built_once():
+    assert error_body('User not found') is error_body('User not found')
@@ -0,0 +1,83 @@
+import re
+import pytest
+from users_common.validation import is_valid_email, validate_many
+
+try:
+    from hypothesis import given, settings, strategies as st
+except ImportError:  # property tests need the optional hypothesis package
+    given = None
+
+
+def legacy_is_valid_email(email):
+    """Step-by-step implementation the handlers used before the shared validator"""
+    if not email or '@' not in email:
+        return False
+    try:
+        local, domain = email.rsplit('@', 1)
+    except ValueError:
+        return False
+    if not local or len(local) > 64:
+        return False
+    if not domain or len(domain) > 255:
+        return False
+    if '.' not in domain or domain.startswith('.') or domain.endswith('.'):
+        return False
+    if '..' in email:
+        return False
+    if not re.match(r'^[a-zA-Z0-9._%+-]+$', local):
+        return False
+    if not re.match(r'^[a-zA-Z0-9.-]+$', domain):
+        return False
+    domain_parts = domain.split('.')
+    if len(domain_parts) < 2:
+        return False
+    tld = domain_parts[-1]
+    if len(tld) < 2 or not tld.isalpha():
+        return False
+    for part in domain_parts:
+        if not part:
+            return False
+    return True
+
+
+EXAMPLES = [
+    'user@example.com', 'test.email@domain.co.uk', 'user+tag@example.org',
+    'user123@test-domain.com', 'a@b.co', 'firstname.lastname@example.com',
+    'email@subdomain.example.com', 'user_name@example.co', 'x@example.com',
+    '.user.@example.com', '%@-.co', 'a@b-.cd', 'user\n@example.com',
+    'bademail', 'bad@email', 'bad@.com', '@example.com', 'user@', 'user@domain',
+    'user..name@domain.com', 'user@domain..com', 'user@domain.com.', 'user@domain.c',
+    'user@domain.c0m', 'a@b@example.com', 'user@exam_ple.com', 'user@example.com\n',
+    'us er@example.com', 'usér@example.com', 'user@exämple.com', 'user@example.çom',
+    'a' * 64 + '@example.com', 'a' * 65 + '@example.com', 'a' * 63 + '\n@example.com',
+    'a' * 64 + '\n@example.com', 'a@' + 'b' * 252 + '.co', 'a@' + 'b' * 253 + '.co',
+    '', None,
+]
+
+
+@pytest.mark.parametrize('email', EXAMPLES)
+def test_matches_legacy_implementation(email):
+    assert is_valid_email(email) == legacy_is_valid_email(email)
+
+
+def test_validate_many_keeps_order():
+    assert validate_many(EXAMPLES) == [legacy_is_valid_email(e) for e in EXAMPLES]
+    assert validate_many([]) == []
+
+
+if given is not None:
+    email_alphabet = st.sampled_from('aZ09._%+-@\n é')
+    emails = st.one_of(
+        st.text(email_alphabet, max_size=80),
+        st.builds(
+            lambda local, labels, tld: local + '@' + '.'.join(labels + [tld]),
+            st.text(email_alphabet, max_size=70),
+            st.lists(st.text(email_alphabet, max_size=10), max_size=4),
+            st.text(email_alphabet, max_size=4),
+        ),
+    )
+
+    @settings(max_examples=2000, deadline=None)
+    @given(emails)
+    def test_property_matches_legacy_implementation(email):
+        assert is_valid_email(email) == legacy_is_valid_email(email)
@@ -0,0 +1,150 @@
+"""
+Concurrent load generator for the user API, reporting latency percentiles
+and throughput. Point it at the local gateway or a deployed stage:
+
+    python amplify/tools/loadtest.py http://localhost:3000 --requests 2000 --concurrency 16
+    python amplify/tools/loadtest.py http://localhost:3000 --max-p95 50
+
+With --max-p95 / --max-p99 (milliseconds) it exits with status 1 when the
+run is slower, so it can gate a deployment.
+"""
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(-(-p * len(sorted_values) // 100)), 1)
+    return sorted_values[rank - 1]
+
+
+class Scenario:
+    """
+    Request mix: every `post_every`-th request creates a user, the others
+    look up one of the users created so far, starting with a seeded one.
+    With `idempotency_keys`, every POST carries an Idempotency-Key header.
+    """
+
+    def __init__(self, base_url, post_every=5, run_id=None, idempotency_keys=False):
+        self.base_url = base_url.rstrip('/')
+        self.post_every = post_every
+        self.idempotency_keys = idempotency_keys
+        self.run_id = run_id or uuid.uuid4().hex[:8]
+        self.counter = itertools.count()
+        self.emails = [f'loadtest-{self.run_id}-seed@example.com']
+        self.lock = threading.Lock()
+
+    def seed_request(self):
+        return self.post_request(self.emails[0])
+
+    def post_request(self, email):
+        body = json.dumps({'email': email, 'name': 'Load Test'}).encode()
+        headers = {'Content-Type': 'application/json'}
+        if self.idempotency_keys:
+            headers['Idempotency-Key'] = email
+        return Request(self.base_url + '/users/create', data=body, method='POST', headers=headers)
+
+    def next_request(self):
+        """
+        The next request, and the email it creates when it is a POST
+        """
+        n = next(self.counter)
+        if self.post_every and n % self.post_every == 0:
+            email = f'loadtest-{self.run_id}-{n}@example.com'
+            return self.post_request(email), email
+        with self.lock:
+            email = self.emails[n % len(self.emails)]
+        return Request(self.base_url + '/users?email=' + quote(email)), None
+
+    def created(self, email):
+        with self.lock:
+            self.emails.append(email)
+
+
+def timed_request(request, timeout):
+    start = time.perf_counter()
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        status = e.code
+    except (URLError, OSError):
+        status = 'error'
+    return (time.perf_counter() - start) * 1000, status
+
+
+def run(scenario, requests=1000, concurrency=8, timeout=30):
+    """
+    Send `requests` requests from `concurrency` threads; returns a summary dict
+    """
+    timed_request(scenario.seed_request(), timeout)
+
+    def worker(_):
+        request, new_email = scenario.next_request()
+        latency, status = timed_request(request, timeout)
+        if new_email and status == 201:
+            scenario.created(new_email)
+        return latency, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': round(elapsed, 3),
+        'rps': round(requests / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        'status': {str(k): v for k, v in sorted(Counter(s for _, s in results).items(), key=str)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the user API')
+    parser.add_argument('base_url')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--post-every', type=int, default=5, help='one POST every N requests (0: GET only)')
+    parser.add_argument('--idempotency-keys', action='store_true', help='send an Idempotency-Key with each POST')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--max-p95', type=float, help='fail when p95 latency exceeds this (ms)')
+    parser.add_argument('--max-p99', type=float, help='fail when p99 latency exceeds this (ms)')
+    args = parser.parse_args()
+
+    scenario = Scenario(args.base_url, args.post_every, idempotency_keys=args.idempotency_keys)
+    summary = run(scenario, args.requests, args.concurrency, args.timeout)
+    print(json.dumps(summary, indent=2))
+
+    failed = [
+        f"{name} {summary[key]} ms > {limit} ms"
+        for name, key, limit in (('p95', 'p95_ms', args.max_p95), ('p99', 'p99_ms', args.max_p99))
+        if limit is not None and summary[key] > limit
+    ]
+    if failed:
+        print("Latency regression: " + ', '.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
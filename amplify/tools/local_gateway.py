@@ -0,0 +1,257 @@
+"""
+Local API Gateway emulator for the user handlers.
+
+Maps the REST API paths onto the Lambda handlers with API Gateway proxy-shaped
+events, against moto server (--moto) or any DynamoDB endpoint such as
+DynamoDB Local (--endpoint-url http://localhost:8000):
+
+    python amplify/tools/local_gateway.py --moto --port 3000
+    curl "http://localhost:3000/users?email=john.doe@example.com"
+"""
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import boto3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FUNCTION_DIR = os.path.join(HERE, '..', 'backend', 'function')
+LAYER_DIR = os.path.join(FUNCTION_DIR, 'usersCommon', 'lib', 'python')
+
+# Same routing as the Amplify REST API: /users/create goes to PostUserHandler,
+# /users and everything below it (/users/{proxy+}) to GetUserHandler
+ROUTES = [
+    ('/users/create', 'PostUserHandler'),
+    ('/users', 'GetUserHandler'),
+]
+USERS_TABLE = os.environ.get('USERS_TABLE', 'users-dev')
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE', 'idempotency-dev')
+
+
+def load_handler(name):
+    """
+    Import a function's src/index.py under its own module name, so several
+    handlers can live in one process
+    """
+    if LAYER_DIR not in sys.path:
+        sys.path.insert(0, LAYER_DIR)
+    path = os.path.join(FUNCTION_DIR, name, 'src', 'index.py')
+    spec = importlib.util.spec_from_file_location(name + '_index', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def create_users_table(endpoint_url=None):
+    """
+    Create the users table with its email GSI, as defined in the storage category
+    """
+    dynamodb = boto3.resource('dynamodb', endpoint_url=endpoint_url)
+    table = dynamodb.create_table(
+        TableName=USERS_TABLE,
+        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'id', 'AttributeType': 'S'},
+            {'AttributeName': 'email', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'email',
+            'KeySchema': [{'AttributeName': 'email', 'KeyType': 'HASH'}],
+            'Projection': {'ProjectionType': 'ALL'}
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.meta.client.get_waiter('table_exists').wait(TableName=USERS_TABLE)
+    return table
+
+
+def create_idempotency_table(endpoint_url=None):
+    """
+    Create the Idempotency-Key table, as defined in the PostUserHandler stack
+    """
+    dynamodb = boto3.resource('dynamodb', endpoint_url=endpoint_url)
+    table = dynamodb.create_table(
+        TableName=IDEMPOTENCY_TABLE,
+        KeySchema=[{'AttributeName': 'id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.meta.client.get_waiter('table_exists').wait(TableName=IDEMPOTENCY_TABLE)
+    table.meta.client.update_time_to_live(
+        TableName=IDEMPOTENCY_TABLE,
+        TimeToLiveSpecification={'AttributeName': 'expiresAt', 'Enabled': True}
+    )
+    return table
+
+
+def create_tables(endpoint_url=None):
+    create_users_table(endpoint_url)
+    create_idempotency_table(endpoint_url)
+
+
+class LambdaContext:
+
+    def __init__(self, function_name, timeout=25):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid.uuid4())
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return int(max(self._deadline - time.monotonic(), 0) * 1000)
+
+
+def api_gateway_event(method, path, query, headers, body):
+    """
+    REST API (v1) Lambda proxy integration event
+    """
+    multi_query = parse_qs(query, keep_blank_values=True)
+    return {
+        'resource': path,
+        'path': path,
+        'httpMethod': method,
+        'headers': dict(headers),
+        'multiValueHeaders': {k: [v] for k, v in headers.items()},
+        'queryStringParameters': {k: v[-1] for k, v in multi_query.items()} or None,
+        'multiValueQueryStringParameters': multi_query or None,
+        'pathParameters': None,
+        'requestContext': {
+            'stage': 'local',
+            'requestId': str(uuid.uuid4()),
+            'httpMethod': method,
+            'path': '/local' + path
+        },
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+class Gateway(ThreadingHTTPServer):
+    daemon_threads = True
+    quiet = True
+
+    def __init__(self, address, handlers):
+        super().__init__(address, GatewayRequestHandler)
+        self.handlers = handlers
+
+    def route(self, path):
+        path = path.rstrip('/') or '/'
+        for prefix, name in ROUTES:
+            if path == prefix or path.startswith(prefix + '/'):
+                return name
+        return None
+
+
+class GatewayRequestHandler(BaseHTTPRequestHandler):
+
+    def handle_request(self):
+        url = urlsplit(self.path)
+        name = self.server.route(url.path)
+        if name is None:
+            body = json.dumps({'message': 'Missing Authentication Token'})
+            self.send(404, {'Content-Type': 'application/json'}, body)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode() if length else None
+        event = api_gateway_event(self.command, url.path, url.query, self.headers, body)
+        try:
+            response = self.server.handlers[name](event, LambdaContext(name))
+        except Exception as e:
+            # API Gateway answers 502 when the integration itself fails
+            print("Handler error:", e)
+            self.send(502, {'Content-Type': 'application/json'}, json.dumps({'message': 'Internal server error'}))
+            return
+        headers = {'Content-Type': 'application/json', **(response.get('headers') or {})}
+        self.send(response['statusCode'], headers, response.get('body') or '')
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = handle_request
+
+    def send(self, status, headers, body):
+        data = body.encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def start_gateway(host='127.0.0.1', port=0, quiet=True):
+    """
+    Serve the handlers in a background thread; returns the server, whose
+    server_address gives the bound port
+    """
+    handlers = {name: load_handler(name) for _, name in ROUTES}
+    server = Gateway((host, port), handlers)
+    server.quiet = quiet
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_moto_server(port=0):
+    """
+    In-process moto server with empty users and idempotency tables; returns (server, endpoint_url)
+    """
+    from moto.server import ThreadedMotoServer
+
+    port = port or free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    endpoint_url = f'http://127.0.0.1:{port}'
+    create_tables(endpoint_url)
+    return server, endpoint_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the user handlers like API Gateway')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--moto', action='store_true', help='start an in-process moto server')
+    parser.add_argument('--endpoint-url', help='DynamoDB endpoint, e.g. DynamoDB Local')
+    parser.add_argument('--create-table', action='store_true', help='create the users and idempotency tables first')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+    if args.moto:
+        for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+            os.environ.setdefault(name, 'testing')
+        _, endpoint_url = start_moto_server()
+    else:
+        endpoint_url = args.endpoint_url
+        if endpoint_url and args.create_table:
+            create_tables(endpoint_url)
+    if endpoint_url:
+        # Picked up by the handlers' boto3 clients
+        os.environ['AWS_ENDPOINT_URL_DYNAMODB'] = endpoint_url
+
+    server = start_gateway(args.host, args.port, args.quiet)
+    host, port = server.server_address[:2]
+    print(f"Gateway listening on http://{host}:{port} (DynamoDB: {endpoint_url or 'AWS'})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# cache_graphiques.py
+"""
+Cache des graphiques rendus, indexé par l'empreinte des données brutes et
+des options de rendu: un même graphique n'est dessiné qu'une fois, même
+demandé par plusieurs threads en même temps.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+from main import empreinte, rendre_graphique_temperature
+
+FORMATS = ("png", "svg")
+# Au-delà, les graphiques déversés le moins récemment utilisés sont supprimés
+MAX_FICHIERS = 1000
+
+
+class CacheGraphiques:
+    """
+    LRU en mémoire d'au plus `capacite` graphiques. Avec un `repertoire`, les
+    graphiques évincés y sont écrits et relus au lieu d'être redessinés; il
+    en garde au plus `max_fichiers`, les moins récemment utilisés partant
+    en premier.
+    """
+
+    def __init__(self, capacite: int = 128, repertoire: Optional[str] = None, rendre=rendre_graphique_temperature,
+                 max_fichiers: int = MAX_FICHIERS):
+        self.capacite = capacite
+        self.repertoire = repertoire
+        self.max_fichiers = max_fichiers
+        self.rendre = rendre
+        # cle -> (format, octets)
+        self.entrees: "OrderedDict[str, tuple]" = OrderedDict()
+        self.en_cours: Dict[str, Future] = {}
+        self.verrou = threading.Lock()
+        self.compteurs = {"succes_memoire": 0, "succes_disque": 0, "rendus": 0, "attentes": 0, "supprimes_disque": 0}
+        if repertoire:
+            os.makedirs(repertoire, exist_ok=True)
+
+    @staticmethod
+    def cle(donnees_brutes: Dict, format: str, options: Dict) -> str:
+        return empreinte({"donnees": donnees_brutes, "format": format, "options": options})
+
+    def chemin(self, cle: str, format: str) -> str:
+        return os.path.join(self.repertoire, f"{cle}.{format}")
+
+    def obtenir(self, donnees_brutes: Dict, format: str = "png", **options) -> bytes:
+        """Octets PNG/SVG du graphique, rendu seulement s'il n'est ni en mémoire ni sur disque"""
+        if format not in FORMATS:
+            raise ValueError(f"Format non pris en charge: {format}")
+        cle = self.cle(donnees_brutes, format, options)
+
+        with self.verrou:
+            if cle in self.entrees:
+                self.entrees.move_to_end(cle)
+                self.compteurs["succes_memoire"] += 1
+                return self.entrees[cle][1]
+            futur = self.en_cours.get(cle)
+            proprietaire = futur is None
+            if proprietaire:
+                futur = self.en_cours[cle] = Future()
+            else:
+                self.compteurs["attentes"] += 1
+
+        # Un seul thread rend le graphique, les autres attendent son résultat
+        if not proprietaire:
+            return futur.result()
+
+        try:
+            contenu = self.lire_disque(cle, format)
+            if contenu is None:
+                contenu = self.rendre(donnees_brutes, format=format, **options)
+                with self.verrou:
+                    self.compteurs["rendus"] += 1
+            else:
+                with self.verrou:
+                    self.compteurs["succes_disque"] += 1
+            self.ajouter(cle, format, contenu)
+            futur.set_result(contenu)
+            return contenu
+        except Exception as e:
+            futur.set_exception(e)
+            raise
+        finally:
+            with self.verrou:
+                del self.en_cours[cle]
+
+    def lire_disque(self, cle: str, format: str) -> Optional[bytes]:
+        if not self.repertoire:
+            return None
+        chemin = self.chemin(cle, format)
+        try:
+            with open(chemin, "rb") as f:
+                contenu = f.read()
+            # La date de modification sert d'ordre LRU pour l'élagage
+            os.utime(chemin)
+            return contenu
+        except FileNotFoundError:
+            return None
+
+    def ajouter(self, cle: str, format: str, contenu: bytes):
+        with self.verrou:
+            self.entrees[cle] = (format, contenu)
+            evinces = []
+            while len(self.entrees) > self.capacite:
+                evinces.append(self.entrees.popitem(last=False))
+        for cle_evincee, (format_evince, contenu_evince) in evinces:
+            self.deverser(cle_evincee, format_evince, contenu_evince)
+
+    def deverser(self, cle: str, format: str, contenu: bytes):
+        if not self.repertoire:
+            return
+        chemin = self.chemin(cle, format)
+        if os.path.exists(chemin):
+            return
+        temporaire = chemin + ".tmp"
+        try:
+            with open(temporaire, "wb") as f:
+                f.write(contenu)
+            os.replace(temporaire, chemin)
+            self.elaguer()
+        except OSError as e:
+            print(f"Erreur lors de l'écriture du graphique en cache: {e}")
+
+    def elaguer(self):
+        """Supprime les fichiers les plus anciens au-delà de `max_fichiers`"""
+        fichiers = []
+        with os.scandir(self.repertoire) as entrees:
+            for entree in entrees:
+                if entree.is_file() and entree.name.endswith(FORMATS):
+                    try:
+                        fichiers.append((entree.stat().st_mtime_ns, entree.path))
+                    except FileNotFoundError:
+                        pass
+        if len(fichiers) <= self.max_fichiers:
+            return
+        fichiers.sort()
+        for _, chemin in fichiers[:len(fichiers) - self.max_fichiers]:
+            try:
+                os.remove(chemin)
+            except FileNotFoundError:
+                pass
+        with self.verrou:
+            self.compteurs["supprimes_disque"] += len(fichiers) - self.max_fichiers
+
+    def statistiques(self) -> Dict:
+        with self.verrou:
+            return {"entrees": len(self.entrees), "en_cours": len(self.en_cours), **self.compteurs}
+
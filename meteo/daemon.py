@@ -0,0 +1,293 @@
+# daemon.py
+"""
+Mode démon: un seul processus garde la session HTTP, matplotlib et l'index
+des empreintes en mémoire, et interroge Open-Meteo juste après la publication
+de chaque run des modèles au lieu d'un cron aveugle.
+
+    python daemon.py --port 8080
+    curl http://localhost:8080/metrics
+    curl -X POST http://localhost:8080/sites/paris/rafraichir
+"""
+import argparse
+import heapq
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence
+
+import requests
+
+from main import (
+    SITES, FICHIER_EMPREINTES, charger_empreintes, sauvegarder_empreintes, traiter_donnees
+)
+
+URL_API = "https://api.open-meteo.com/v1/forecast"
+# Runs des modèles globaux (UTC) et délai avant que Open-Meteo ne les serve
+HEURES_RUNS = (0, 6, 12, 18)
+DELAI_PUBLICATION_S = 3 * 3600
+GIGUE_S = 600
+# Coordonnées par appel: garde l'URL courte et limite un échec à ce lot
+TAILLE_LOT = 50
+DELAI_NOUVEL_ESSAI_S = 300
+
+
+def prochaine_echeance(instant: float, heures: Sequence[int] = HEURES_RUNS,
+                       delai: float = DELAI_PUBLICATION_S, gigue: float = GIGUE_S,
+                       alea: Optional[random.Random] = None) -> float:
+    """
+    Premier instant (timestamp) après `instant` où un nouveau run est
+    disponible, décalé d'une gigue aléatoire pour étaler les appels
+    """
+    alea = alea or random
+    jour = datetime.fromtimestamp(instant, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    for decalage in (-1, 0, 1):
+        for heure in sorted(heures):
+            disponible = (jour + timedelta(days=decalage, hours=heure)).timestamp() + delai
+            if disponible > instant:
+                return disponible + alea.uniform(0, gigue)
+    raise ValueError("Aucune heure de run configurée")
+
+
+def appeler_api_meteo_groupe(session: requests.Session, coordonnees: Sequence[tuple],
+                             jours: int = 7) -> List[Dict]:
+    """Un seul appel pour plusieurs sites; les réponses suivent l'ordre des coordonnées"""
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in coordonnees),
+        "longitude": ",".join(str(lon) for _, lon in coordonnees),
+        "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
+        "timezone": "Europe/Paris",
+        "forecast_days": jours
+    }
+    response = session.get(URL_API, params=params, timeout=30)
+    response.raise_for_status()
+    donnees = response.json()
+    # Open-Meteo ne renvoie une liste que pour plusieurs coordonnées
+    return donnees if isinstance(donnees, list) else [donnees]
+
+
+class Planificateur:
+    """
+    File de priorité des sites par échéance. Les sites dus au même moment
+    sont regroupés en lots d'au plus `taille_lot` coordonnées par appel.
+    """
+
+    def __init__(self, sites: Dict[str, Dict] = SITES,
+                 appeler: Optional[Callable[[Sequence[tuple]], List[Dict]]] = None,
+                 horloge: Callable[[], float] = time.time,
+                 fichier_empreintes: str = FICHIER_EMPREINTES,
+                 taille_lot: int = TAILLE_LOT, gigue: float = GIGUE_S,
+                 alea: Optional[random.Random] = None):
+        self.sites = sites
+        self.session = requests.Session()
+        self.appeler = appeler or (lambda coordonnees: appeler_api_meteo_groupe(self.session, coordonnees))
+        self.horloge = horloge
+        self.fichier_empreintes = fichier_empreintes
+        self.taille_lot = taille_lot
+        self.gigue = gigue
+        self.alea = alea or random.Random()
+        self.index = charger_empreintes(fichier_empreintes)
+        self.verrou = threading.Lock()
+        self.reveil = threading.Event()
+        self.arret = threading.Event()
+        self.file: List[tuple] = []
+        # Échéance en vigueur par site; les entrées périmées du tas sont ignorées
+        self.echeances: Dict[str, float] = {}
+        self.compteurs = {"appels_api": 0, "sites_traites": 0, "sites_modifies": 0, "erreurs": 0}
+        self.dernier_retard_s = 0.0
+        # Au démarrage, tous les sites sont dus immédiatement
+        maintenant = horloge()
+        for site in sites:
+            self.planifier(site, maintenant)
+
+    def planifier(self, site: str, echeance: float):
+        with self.verrou:
+            self.echeances[site] = echeance
+            heapq.heappush(self.file, (echeance, site))
+        self.reveil.set()
+
+    def demander(self, site: str) -> bool:
+        """Rafraîchissement immédiat d'un site, hors calendrier"""
+        if site not in self.sites:
+            return False
+        self.planifier(site, self.horloge())
+        return True
+
+    def sites_dus(self, maintenant: float) -> List[tuple]:
+        dus = []
+        with self.verrou:
+            while self.file and self.file[0][0] <= maintenant:
+                echeance, site = heapq.heappop(self.file)
+                if self.echeances.get(site) == echeance:
+                    del self.echeances[site]
+                    dus.append((echeance, site))
+        return dus
+
+    def executer_lot(self, lot: List[tuple], maintenant: float, prochaine: float) -> int:
+        """
+        Récupère et traite un lot de sites; renvoie le nombre de sites
+        modifiés. Tout site en échec ou sans réponse est replanifié pour un
+        nouvel essai, jamais perdu.
+        """
+        sites = [site for _, site in lot]
+        coordonnees = [(self.sites[s]["latitude"], self.sites[s]["longitude"]) for s in sites]
+        nouvel_essai = maintenant + DELAI_NOUVEL_ESSAI_S
+        self.compteurs["appels_api"] += 1
+        try:
+            reponses = self.appeler(coordonnees)
+            if not isinstance(reponses, list):
+                raise ValueError(f"Réponse inattendue: {type(reponses).__name__}")
+        except Exception as e:
+            print(f"Erreur lors de l'appel API ({', '.join(sites)}): {e}")
+            self.compteurs["erreurs"] += 1
+            for site in sites:
+                self.planifier(site, nouvel_essai)
+            return 0
+
+        if len(reponses) < len(sites):
+            print(f"Réponses manquantes pour: {', '.join(sites[len(reponses):])}")
+            self.compteurs["erreurs"] += 1
+            for site in sites[len(reponses):]:
+                self.planifier(site, nouvel_essai)
+
+        modifies = 0
+        for site, donnees in zip(sites, reponses):
+            self.compteurs["sites_traites"] += 1
+            try:
+                resultat = traiter_donnees(site, self.sites[site], donnees, self.index, afficher=False)
+            except Exception as e:
+                print(f"Erreur lors du traitement de {site}: {e}")
+                resultat = None
+            if resultat is None:
+                # Analyse ou sauvegarde en échec: réessayé sans attendre le prochain run
+                self.compteurs["erreurs"] += 1
+                self.planifier(site, nouvel_essai)
+                continue
+            if resultat:
+                modifies += 1
+            self.planifier(site, prochaine)
+        self.compteurs["sites_modifies"] += modifies
+        return modifies
+
+    def tourner_une_fois(self) -> int:
+        """Traite tous les sites dus; renvoie le nombre de sites traités"""
+        maintenant = self.horloge()
+        dus = self.sites_dus(maintenant)
+        if not dus:
+            return 0
+        self.dernier_retard_s = max(maintenant - echeance for echeance, _ in dus)
+        # Une seule gigue pour la vague: les sites restent dus ensemble et regroupés
+        prochaine = prochaine_echeance(maintenant, gigue=self.gigue, alea=self.alea)
+        modifies = 0
+        for debut in range(0, len(dus), self.taille_lot):
+            modifies += self.executer_lot(dus[debut:debut + self.taille_lot], maintenant, prochaine)
+        if modifies:
+            sauvegarder_empreintes(self.index, self.fichier_empreintes)
+        return len(dus)
+
+    def delai_avant_prochaine(self) -> Optional[float]:
+        with self.verrou:
+            if not self.echeances:
+                return None
+            return max(min(self.echeances.values()) - self.horloge(), 0.0)
+
+    def boucle(self):
+        while not self.arret.is_set():
+            try:
+                self.tourner_une_fois()
+            except Exception as e:
+                # Les lots replanifient leurs sites eux-mêmes: le démon continue
+                print(f"Erreur inattendue du planificateur: {e}")
+            self.reveil.clear()
+            # Réveillé à la prochaine échéance, par /rafraichir ou par l'arrêt
+            self.reveil.wait(self.delai_avant_prochaine())
+
+    def arreter(self):
+        self.arret.set()
+        self.reveil.set()
+
+    def metriques(self) -> Dict:
+        maintenant = self.horloge()
+        with self.verrou:
+            echeances = list(self.echeances.values())
+        dues = [echeance for echeance in echeances if echeance <= maintenant]
+        return {
+            "file_attente": len(dues),
+            "sites_planifies": len(echeances),
+            "retard_s": round(maintenant - min(dues), 3) if dues else 0.0,
+            "dernier_retard_s": round(self.dernier_retard_s, 3),
+            "prochaine_echeance": (
+                datetime.fromtimestamp(min(echeances), timezone.utc).isoformat() if echeances else None
+            ),
+            **self.compteurs
+        }
+
+
+class ServeurControle(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, adresse, planificateur: Planificateur):
+        super().__init__(adresse, GestionnaireControle)
+        self.planificateur = planificateur
+
+
+class GestionnaireControle(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self.repondre(200, self.server.planificateur.metriques())
+        elif self.path == "/sante":
+            self.repondre(200, {"statut": "ok"})
+        else:
+            self.repondre(404, {"erreur": "Route inconnue"})
+
+    def do_POST(self):
+        morceaux = self.path.strip("/").split("/")
+        if len(morceaux) == 3 and morceaux[0] == "sites" and morceaux[2] == "rafraichir":
+            if self.server.planificateur.demander(morceaux[1]):
+                self.repondre(202, {"site": morceaux[1], "statut": "planifié"})
+            else:
+                self.repondre(404, {"erreur": f"Site inconnu: {morceaux[1]}"})
+        else:
+            self.repondre(404, {"erreur": "Route inconnue"})
+
+    def repondre(self, statut: int, corps: Dict):
+        donnees = json.dumps(corps, ensure_ascii=False).encode("utf-8")
+        self.send_response(statut)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(donnees)))
+        self.end_headers()
+        self.wfile.write(donnees)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def demarrer_controle(planificateur: Planificateur, hote: str = "127.0.0.1", port: int = 0) -> ServeurControle:
+    serveur = ServeurControle((hote, port), planificateur)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    return serveur
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Démon de récupération des prévisions météo")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT)
+    parser.add_argument("--gigue", type=float, default=GIGUE_S, help="gigue maximale (secondes)")
+    args = parser.parse_args()
+
+    planificateur = Planificateur(taille_lot=args.taille_lot, gigue=args.gigue)
+    serveur = demarrer_controle(planificateur, args.hote, args.port)
+    print(f"🛰️  Démon démarré, métriques sur http://{args.hote}:{serveur.server_address[1]}/metrics")
+    try:
+        planificateur.boucle()
+    except KeyboardInterrupt:
+        planificateur.arreter()
+        serveur.shutdown()
+
+
+if __name__ == "__main__":
+    main()
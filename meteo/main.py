@@ -1,9 +1,18 @@
 # main.py
 import requests
+import hashlib
+import io
 import json
+import os
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+SITES: Dict[str, Dict] = {
+    "paris": {"latitude": 48.8566, "longitude": 2.3522, "fichier": "meteo.json"},
+}
+FICHIER_EMPREINTES = "meteo_empreintes.json"
 
 
 def est_pair(n: int) -> bool:
@@ -86,48 +95,138 @@ def sauvegarder_resultats(analyse: Dict, fichier: str = "meteo.json") -> bool:
         return False
 
 
-def afficher_graphique_temperature(analyse: Dict):
-    if "donnees_brutes" not in analyse:
-        print("Erreur: données brutes manquantes pour le graphique")
-        return
+def empreinte(valeur) -> str:
+    contenu = json.dumps(valeur, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+def empreintes_jours(daily: Dict) -> Dict[str, str]:
+    """Empreinte de chaque jour du payload `daily`, indexée par date"""
+    champs = sorted(champ for champ in daily if champ != "time")
+    return {
+        date: empreinte([daily[champ][i] for champ in champs])
+        for i, date in enumerate(daily.get("time", []))
+    }
+
+
+def jours_modifies(avant: Dict[str, str], apres: Dict[str, str]) -> List[str]:
+    """Dates nouvelles ou dont les valeurs ont changé depuis la dernière exécution"""
+    return [date for date, valeur in apres.items() if avant.get(date) != valeur]
+
+
+def charger_empreintes(fichier: str = FICHIER_EMPREINTES) -> Dict:
+    try:
+        with open(fichier, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Index des empreintes illisible, tout sera recalculé: {e}")
+        return {}
+
+
+def sauvegarder_empreintes(index: Dict, fichier: str = FICHIER_EMPREINTES) -> bool:
+    try:
+        # Écriture atomique: un index à moitié écrit ferait tout recalculer
+        temporaire = fichier + ".tmp"
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        os.replace(temporaire, fichier)
+        return True
+    except Exception as e:
+        print(f"Erreur lors de la sauvegarde des empreintes: {e}")
+        return False
+
+
+def detecter_changements(site: str, donnees_meteo: Dict, index: Dict) -> Optional[List[str]]:
+    """
+    None si le payload `daily` est identique à celui de la dernière exécution
+    pour ce site, sinon la liste des jours modifiés
+    """
+    daily = donnees_meteo.get("daily") or {}
+    precedent = index.get(site, {})
+    if precedent.get("empreinte") == empreinte(daily):
+        return None
+    return jours_modifies(precedent.get("jours", {}), empreintes_jours(daily))
+
+
+def enregistrer_empreintes(site: str, donnees_meteo: Dict, index: Dict):
+    daily = donnees_meteo["daily"]
+    index[site] = {"empreinte": empreinte(daily), "jours": empreintes_jours(daily)}
 
-    donnees = analyse["donnees_brutes"]
+
+def tracer_temperature(ax, donnees: Dict):
     dates = [datetime.fromisoformat(date).strftime("%d/%m") for date in donnees["dates"]]
 
-    plt.figure(figsize=(12, 6))
-    plt.plot(dates, donnees["temp_max"], 'r-o', label='Température max', linewidth=2)
-    plt.plot(dates, donnees["temp_min"], 'b-o', label='Température min', linewidth=2)
-    plt.fill_between(dates, donnees["temp_min"], donnees["temp_max"], alpha=0.3, color='gray')
+    ax.plot(dates, donnees["temp_max"], 'r-o', label='Température max', linewidth=2)
+    ax.plot(dates, donnees["temp_min"], 'b-o', label='Température min', linewidth=2)
+    ax.fill_between(dates, donnees["temp_min"], donnees["temp_max"], alpha=0.3, color='gray')
 
-    plt.title('Prévisions de température sur 7 jours', fontsize=14, fontweight='bold')
-    plt.xlabel('Date')
-    plt.ylabel('Température (°C)')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    ax.set_title('Prévisions de température sur 7 jours', fontsize=14, fontweight='bold')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Température (°C)')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    ax.tick_params(axis='x', labelrotation=45)
 
     for i, (tmax, tmin) in enumerate(zip(donnees["temp_max"], donnees["temp_min"])):
-        plt.annotate(f'{tmax}°', (i, tmax), textcoords="offset points", xytext=(0,10), ha='center')
-        plt.annotate(f'{tmin}°', (i, tmin), textcoords="offset points", xytext=(0,-15), ha='center')
+        ax.annotate(f'{tmax}°', (i, tmax), textcoords="offset points", xytext=(0,10), ha='center')
+        ax.annotate(f'{tmin}°', (i, tmin), textcoords="offset points", xytext=(0,-15), ha='center')
+
 
+def afficher_graphique_temperature(analyse: Dict):
+    if "donnees_brutes" not in analyse:
+        print("Erreur: données brutes manquantes pour le graphique")
+        return
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    tracer_temperature(ax, analyse["donnees_brutes"])
+    fig.tight_layout()
     plt.show()
 
 
-def main():
-    latitude, longitude = 48.8566, 2.3522
-    print("🌤️  Récupération des données météo...")
-    donnees = appeler_api_meteo(latitude, longitude)
+def rendre_graphique_temperature(donnees_brutes: Dict, format: str = "png",
+                                 largeur: float = 12, hauteur: float = 6, dpi: int = 100) -> bytes:
+    """
+    Le graphique de afficher_graphique_temperature en PNG ou SVG, sans passer
+    par l'état global de pyplot (utilisable depuis plusieurs threads)
+    """
+    fig = Figure(figsize=(largeur, hauteur), dpi=dpi)
+    tracer_temperature(fig.add_subplot(), donnees_brutes)
+    fig.tight_layout()
+    tampon = io.BytesIO()
+    fig.savefig(tampon, format=format)
+    return tampon.getvalue()
+
+
+def traiter_site(site: str, config: Dict, index: Dict) -> Optional[bool]:
+    """Analyse, sauvegarde et affiche un site si ses prévisions ont changé (voir traiter_donnees)"""
+    print(f"🌤️  Récupération des données météo ({site})...")
+    donnees = appeler_api_meteo(config["latitude"], config["longitude"])
 
     if not donnees:
         print("❌ Impossible de récupérer les données météo")
-        return
+        return None
+    return traiter_donnees(site, config, donnees, index)
+
+
+def traiter_donnees(site: str, config: Dict, donnees: Dict, index: Dict, afficher: bool = True) -> Optional[bool]:
+    """
+    Analyse et sauvegarde des données déjà récupérées, si elles ont changé.
+    Renvoie True si les résultats ont été mis à jour, False si les prévisions
+    sont inchangées et None en cas d'échec (analyse ou sauvegarde).
+    """
+    modifies = detecter_changements(site, donnees, index)
+    if modifies is None:
+        print("✅ Prévisions inchangées, rien à recalculer")
+        return False
+    print(f"🔄 Jours modifiés: {', '.join(modifies) or 'aucun (jours retirés)'}")
 
     print("📊 Analyse des données...")
     analyse = analyser_donnees_meteo(donnees)
     if "erreur" in analyse:
         print(f"❌ Erreur d'analyse: {analyse['erreur']}")
-        return
+        return None
 
     print("\n📈 Résultats:")
     print(f"Période: du {analyse['periode']['debut']} au {analyse['periode']['fin']}")
@@ -137,10 +236,23 @@ def main():
     print(f"Jours avec pluie: {analyse['precipitations']['jours_avec_pluie']}")
 
     print("\n💾 Sauvegarde des résultats...")
-    sauvegarder_resultats(analyse)
+    if not sauvegarder_resultats(analyse, config["fichier"]):
+        return None
+    # L'empreinte n'est retenue qu'une fois les résultats écrits
+    enregistrer_empreintes(site, donnees, index)
+
+    if afficher:
+        print("\n📊 Affichage du graphique...")
+        afficher_graphique_temperature(analyse)
+    return True
+
 
-    print("\n📊 Affichage du graphique...")
-    afficher_graphique_temperature(analyse)
+def main(sites: Dict[str, Dict] = SITES, fichier_empreintes: str = FICHIER_EMPREINTES):
+    index = charger_empreintes(fichier_empreintes)
+    modifies = [site for site, config in sites.items() if traiter_site(site, config, index)]
+    if modifies:
+        sauvegarder_empreintes(index, fichier_empreintes)
+    return modifies
 
 
 if __name__ == "__main__":
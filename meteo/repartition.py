@@ -0,0 +1,414 @@
+# repartition.py
+"""
+Répartition des sites entre plusieurs machines.
+
+Les sites sont rangés dans un nombre fixe de shards (hash du nom). Chaque
+shard revient au travailleur vivant désigné par un anneau de hachage
+cohérent: quand un travailleur arrive ou disparaît, seuls ses shards
+changent de main. Un shard n'est traité qu'après avoir obtenu son bail dans
+le magasin partagé, et un site n'est acquitté pour le cycle qu'une fois ses
+résultats sauvegardés: un travailleur qui tombe en cours de route voit ses
+sites repris par le suivant (au moins une fois).
+
+    python repartition.py --nom noeud-1 --postgres postgresql://meteo@bdd/meteo
+    python repartition.py --nom proc-1 --sqlite /var/lib/meteo/baux.db
+
+Plusieurs machines partagent un magasin Postgres (psycopg, dépendance
+optionnelle); leurs horloges doivent être synchronisées (NTP), les baux
+étant datés par chaque travailleur. Le magasin SQLite ne convient qu'à des
+processus d'une même machine, sur un disque local: son verrouillage n'est
+pas fiable sur un système de fichiers réseau.
+"""
+import argparse
+import bisect
+import fcntl
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set
+
+try:
+    import psycopg
+except ImportError:  # psycopg est optionnel, seul MagasinPostgres en a besoin
+    psycopg = None
+
+from main import SITES, appeler_api_meteo, analyser_donnees_meteo, sauvegarder_resultats
+
+NB_SHARDS = 64
+TTL_BAIL_S = 60
+# Un cycle par run des modèles: un site est traité une fois par cycle
+DUREE_CYCLE_S = 6 * 3600
+# Un site en échec est réessayé après ce délai, doublé à chaque nouvel échec
+DELAI_NOUVEL_ESSAI_S = 60
+DELAI_NOUVEL_ESSAI_MAX_S = 3600
+
+
+def hacher(cle: str) -> int:
+    return int.from_bytes(hashlib.sha256(cle.encode("utf-8")).digest()[:8], "big")
+
+
+def shard_de_site(site: str, nb_shards: int = NB_SHARDS) -> int:
+    return hacher(site) % nb_shards
+
+
+class AnneauCoherent:
+    """Anneau de hachage cohérent, avec des nœuds virtuels pour lisser la charge"""
+
+    def __init__(self, membres, repliques: int = 64):
+        self.points = sorted(
+            (hacher(f"{membre}#{i}"), membre) for membre in membres for i in range(repliques)
+        )
+        self.positions = [position for position, _ in self.points]
+
+    def proprietaire(self, cle: str) -> Optional[str]:
+        if not self.points:
+            return None
+        i = bisect.bisect(self.positions, hacher(cle)) % len(self.points)
+        return self.points[i][1]
+
+
+class MagasinSQLite:
+    """Baux, battements de cœur et acquittements dans une base SQLite locale (une seule machine)"""
+
+    def __init__(self, chemin: str):
+        self.chemin = chemin
+        with self.connexion() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS travailleurs (nom TEXT PRIMARY KEY, expire REAL NOT NULL)")
+            c.execute("CREATE TABLE IF NOT EXISTS baux "
+                      "(shard INTEGER PRIMARY KEY, travailleur TEXT NOT NULL, expire REAL NOT NULL)")
+            c.execute("CREATE TABLE IF NOT EXISTS acquittements "
+                      "(site TEXT NOT NULL, cycle INTEGER NOT NULL, PRIMARY KEY (site, cycle))")
+
+    @contextmanager
+    def connexion(self):
+        connexion = sqlite3.connect(self.chemin, timeout=30, isolation_level="IMMEDIATE")
+        try:
+            with connexion:
+                yield connexion
+        finally:
+            connexion.close()
+
+    def battement(self, nom: str, expire: float):
+        with self.connexion() as c:
+            c.execute("INSERT INTO travailleurs (nom, expire) VALUES (?, ?) "
+                      "ON CONFLICT (nom) DO UPDATE SET expire = excluded.expire", (nom, expire))
+
+    def quitter(self, nom: str):
+        with self.connexion() as c:
+            c.execute("DELETE FROM travailleurs WHERE nom = ?", (nom,))
+            c.execute("DELETE FROM baux WHERE travailleur = ?", (nom,))
+
+    def vivants(self, maintenant: float) -> List[str]:
+        with self.connexion() as c:
+            lignes = c.execute("SELECT nom FROM travailleurs WHERE expire > ? ORDER BY nom", (maintenant,))
+            return [nom for nom, in lignes]
+
+    def acquerir(self, shard: int, nom: str, expire: float, maintenant: float) -> bool:
+        """Prend ou renouvelle le bail s'il est libre, expiré ou déjà le nôtre"""
+        with self.connexion() as c:
+            curseur = c.execute(
+                "INSERT INTO baux (shard, travailleur, expire) VALUES (?, ?, ?) "
+                "ON CONFLICT (shard) DO UPDATE SET travailleur = excluded.travailleur, expire = excluded.expire "
+                "WHERE baux.expire <= ? OR baux.travailleur = excluded.travailleur",
+                (shard, nom, expire, maintenant))
+            return curseur.rowcount == 1
+
+    def liberer(self, shard: int, nom: str):
+        with self.connexion() as c:
+            c.execute("DELETE FROM baux WHERE shard = ? AND travailleur = ?", (shard, nom))
+
+    def acquitter(self, site: str, cycle: int):
+        with self.connexion() as c:
+            c.execute("INSERT OR IGNORE INTO acquittements (site, cycle) VALUES (?, ?)", (site, cycle))
+
+    def acquittes(self, sites: List[str], cycle: int) -> Set[str]:
+        with self.connexion() as c:
+            lignes = c.execute("SELECT site FROM acquittements WHERE cycle = ?", (cycle,))
+            return {site for site, in lignes} & set(sites)
+
+    def purger(self, cycle: int):
+        """Supprime les acquittements des cycles antérieurs à `cycle`"""
+        with self.connexion() as c:
+            c.execute("DELETE FROM acquittements WHERE cycle < ?", (cycle,))
+
+
+class MagasinPostgres:
+    """Même interface que MagasinSQLite dans une base Postgres, pour des travailleurs sur plusieurs machines"""
+
+    def __init__(self, dsn: str):
+        if psycopg is None:
+            raise RuntimeError("MagasinPostgres nécessite psycopg (pip install psycopg)")
+        self.dsn = dsn
+        with self.connexion() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS travailleurs "
+                      "(nom TEXT PRIMARY KEY, expire DOUBLE PRECISION NOT NULL)")
+            c.execute("CREATE TABLE IF NOT EXISTS baux "
+                      "(shard INTEGER PRIMARY KEY, travailleur TEXT NOT NULL, expire DOUBLE PRECISION NOT NULL)")
+            c.execute("CREATE TABLE IF NOT EXISTS acquittements "
+                      "(site TEXT NOT NULL, cycle INTEGER NOT NULL, PRIMARY KEY (site, cycle))")
+
+    @contextmanager
+    def connexion(self):
+        # Une transaction par opération, validée à la sortie du bloc
+        with psycopg.connect(self.dsn) as connexion:
+            yield connexion
+
+    def battement(self, nom: str, expire: float):
+        with self.connexion() as c:
+            c.execute("INSERT INTO travailleurs (nom, expire) VALUES (%s, %s) "
+                      "ON CONFLICT (nom) DO UPDATE SET expire = excluded.expire", (nom, expire))
+
+    def quitter(self, nom: str):
+        with self.connexion() as c:
+            c.execute("DELETE FROM travailleurs WHERE nom = %s", (nom,))
+            c.execute("DELETE FROM baux WHERE travailleur = %s", (nom,))
+
+    def vivants(self, maintenant: float) -> List[str]:
+        with self.connexion() as c:
+            lignes = c.execute("SELECT nom FROM travailleurs WHERE expire > %s ORDER BY nom", (maintenant,))
+            return [nom for nom, in lignes]
+
+    def acquerir(self, shard: int, nom: str, expire: float, maintenant: float) -> bool:
+        # La ligne en conflit est verrouillée: deux travailleurs ne peuvent pas gagner le même bail
+        with self.connexion() as c:
+            curseur = c.execute(
+                "INSERT INTO baux (shard, travailleur, expire) VALUES (%s, %s, %s) "
+                "ON CONFLICT (shard) DO UPDATE SET travailleur = excluded.travailleur, expire = excluded.expire "
+                "WHERE baux.expire <= %s OR baux.travailleur = excluded.travailleur",
+                (shard, nom, expire, maintenant))
+            return curseur.rowcount == 1
+
+    def liberer(self, shard: int, nom: str):
+        with self.connexion() as c:
+            c.execute("DELETE FROM baux WHERE shard = %s AND travailleur = %s", (shard, nom))
+
+    def acquitter(self, site: str, cycle: int):
+        with self.connexion() as c:
+            c.execute("INSERT INTO acquittements (site, cycle) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+                      (site, cycle))
+
+    def acquittes(self, sites: List[str], cycle: int) -> Set[str]:
+        with self.connexion() as c:
+            lignes = c.execute("SELECT site FROM acquittements WHERE cycle = %s", (cycle,))
+            return {site for site, in lignes} & set(sites)
+
+    def purger(self, cycle: int):
+        with self.connexion() as c:
+            c.execute("DELETE FROM acquittements WHERE cycle < %s", (cycle,))
+
+
+class MagasinFichier:
+    """
+    Même interface que MagasinSQLite dans un fichier JSON protégé par un
+    verrou flock, pour les tests et une seule machine
+    """
+
+    def __init__(self, chemin: str):
+        self.chemin = chemin
+
+    @contextmanager
+    def etat(self):
+        with open(self.chemin + ".lock", "w") as verrou:
+            fcntl.flock(verrou, fcntl.LOCK_EX)
+            try:
+                with open(self.chemin, encoding="utf-8") as f:
+                    etat = json.load(f)
+            except FileNotFoundError:
+                etat = {"travailleurs": {}, "baux": {}, "acquittements": {}}
+            yield etat
+            temporaire = self.chemin + ".tmp"
+            with open(temporaire, "w", encoding="utf-8") as f:
+                json.dump(etat, f)
+            os.replace(temporaire, self.chemin)
+
+    def battement(self, nom: str, expire: float):
+        with self.etat() as etat:
+            etat["travailleurs"][nom] = expire
+
+    def quitter(self, nom: str):
+        with self.etat() as etat:
+            etat["travailleurs"].pop(nom, None)
+            etat["baux"] = {s: b for s, b in etat["baux"].items() if b["travailleur"] != nom}
+
+    def vivants(self, maintenant: float) -> List[str]:
+        with self.etat() as etat:
+            return sorted(nom for nom, expire in etat["travailleurs"].items() if expire > maintenant)
+
+    def acquerir(self, shard: int, nom: str, expire: float, maintenant: float) -> bool:
+        with self.etat() as etat:
+            bail = etat["baux"].get(str(shard))
+            if bail and bail["expire"] > maintenant and bail["travailleur"] != nom:
+                return False
+            etat["baux"][str(shard)] = {"travailleur": nom, "expire": expire}
+            return True
+
+    def liberer(self, shard: int, nom: str):
+        with self.etat() as etat:
+            if etat["baux"].get(str(shard), {}).get("travailleur") == nom:
+                del etat["baux"][str(shard)]
+
+    def acquitter(self, site: str, cycle: int):
+        with self.etat() as etat:
+            acquittes = etat["acquittements"].setdefault(str(cycle), [])
+            if site not in acquittes:
+                acquittes.append(site)
+
+    def acquittes(self, sites: List[str], cycle: int) -> Set[str]:
+        with self.etat() as etat:
+            return set(etat["acquittements"].get(str(cycle), [])) & set(sites)
+
+    def purger(self, cycle: int):
+        with self.etat() as etat:
+            etat["acquittements"] = {c: s for c, s in etat["acquittements"].items() if int(c) >= cycle}
+
+
+def traiter_site_pipeline(site: str, config: Dict) -> bool:
+    """appeler_api_meteo → analyser_donnees_meteo → sauvegarder_resultats"""
+    donnees = appeler_api_meteo(config["latitude"], config["longitude"])
+    if not donnees:
+        return False
+    analyse = analyser_donnees_meteo(donnees)
+    if "erreur" in analyse:
+        print(f"❌ Erreur d'analyse ({site}): {analyse['erreur']}")
+        return False
+    return sauvegarder_resultats(analyse, config["fichier"])
+
+
+class Travailleur:
+    """
+    Un nœud de traitement: signale sa présence, ajuste ses baux à l'anneau
+    des travailleurs vivants puis traite les sites non acquittés de ses shards
+    """
+
+    def __init__(self, nom: str, magasin, sites: Dict[str, Dict] = SITES,
+                 nb_shards: int = NB_SHARDS, ttl: float = TTL_BAIL_S,
+                 traiter: Callable[[str, Dict], bool] = traiter_site_pipeline,
+                 horloge: Callable[[], float] = time.time):
+        self.nom = nom
+        self.magasin = magasin
+        self.sites = sites
+        self.nb_shards = nb_shards
+        self.ttl = ttl
+        self.traiter = traiter
+        self.horloge = horloge
+        self.shards: Set[int] = set()
+        self.cycle: Optional[int] = None
+        # site -> (instant du prochain essai, nombre d'échecs consécutifs)
+        self.echecs: Dict[str, tuple] = {}
+        self.arret = threading.Event()
+        self.sites_par_shard: Dict[int, List[str]] = {}
+        for site in sorted(sites):
+            self.sites_par_shard.setdefault(shard_de_site(site, nb_shards), []).append(site)
+
+    def shards_cibles(self, vivants: List[str]) -> Set[int]:
+        anneau = AnneauCoherent(vivants)
+        return {shard for shard in range(self.nb_shards) if anneau.proprietaire(str(shard)) == self.nom}
+
+    def reequilibrer(self) -> Set[int]:
+        """Battement de cœur, puis libère les shards cédés et réclame les nouveaux"""
+        maintenant = self.horloge()
+        expire = maintenant + self.ttl
+        self.magasin.battement(self.nom, expire)
+        cibles = self.shards_cibles(self.magasin.vivants(maintenant))
+        for shard in self.shards - cibles:
+            self.magasin.liberer(shard, self.nom)
+        # Un shard encore tenu par son ancien propriétaire est repris à l'expiration du bail
+        self.shards = {shard for shard in cibles if self.magasin.acquerir(shard, self.nom, expire, maintenant)}
+        return self.shards
+
+    def traiter_shard(self, shard: int, cycle: int) -> List[str]:
+        """
+        Traite les sites non acquittés du shard dont le prochain essai est
+        dû; renvoie ceux qui ont abouti. Un site en échec n'interrompt pas
+        le shard, il est réessayé plus tard.
+        """
+        sites = self.sites_par_shard.get(shard, [])
+        traites = []
+        for site in sorted(set(sites) - self.magasin.acquittes(sites, cycle)):
+            maintenant = self.horloge()
+            if self.echecs.get(site, (0, 0))[0] > maintenant:
+                continue
+            # Battement et bail renouvelés ensemble: un shard lent ne fait pas
+            # disparaître le travailleur de l'anneau tant qu'il tient ses baux
+            self.magasin.battement(self.nom, maintenant + self.ttl)
+            # Bail perdu (pause trop longue): le nouveau propriétaire reprendra
+            if not self.magasin.acquerir(shard, self.nom, maintenant + self.ttl, maintenant):
+                self.shards.discard(shard)
+                break
+            try:
+                reussi = self.traiter(site, self.sites[site])
+            except Exception as e:
+                print(f"❌ Erreur lors du traitement de {site}: {e}")
+                reussi = False
+            if reussi:
+                self.echecs.pop(site, None)
+                self.magasin.acquitter(site, cycle)
+                traites.append(site)
+            else:
+                self.differer(site, maintenant)
+        return traites
+
+    def differer(self, site: str, maintenant: float):
+        nb_echecs = self.echecs.get(site, (0, 0))[1] + 1
+        delai = min(DELAI_NOUVEL_ESSAI_S * 2 ** (nb_echecs - 1), DELAI_NOUVEL_ESSAI_MAX_S)
+        self.echecs[site] = (maintenant + delai, nb_echecs)
+
+    def tourner_une_fois(self, cycle: Optional[int] = None) -> List[str]:
+        if cycle is None:
+            cycle = int(self.horloge() // DUREE_CYCLE_S)
+        if cycle != self.cycle:
+            # Nouveau cycle: les acquittements des précédents ne servent plus
+            self.magasin.purger(cycle)
+            self.echecs.clear()
+            self.cycle = cycle
+        traites = []
+        for shard in sorted(self.reequilibrer()):
+            traites += self.traiter_shard(shard, cycle)
+        return traites
+
+    def boucle(self):
+        try:
+            while not self.arret.is_set():
+                try:
+                    self.tourner_une_fois()
+                except Exception as e:
+                    # Magasin indisponible, par exemple: on réessaie au prochain tour
+                    print(f"❌ Erreur du travailleur {self.nom}: {e}")
+                self.arret.wait(self.ttl / 3)
+        finally:
+            self.magasin.quitter(self.nom)
+
+    def arreter(self):
+        self.arret.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Travailleur de la répartition des sites météo")
+    parser.add_argument("--nom", default=f"{os.uname().nodename}-{os.getpid()}")
+    groupe = parser.add_mutually_exclusive_group(required=True)
+    groupe.add_argument("--postgres", metavar="DSN", help="base Postgres des baux, partagée entre machines")
+    groupe.add_argument("--sqlite", help="base SQLite locale des baux (processus d'une seule machine)")
+    groupe.add_argument("--fichier", help="magasin JSON local (tests, une seule machine)")
+    parser.add_argument("--ttl", type=float, default=TTL_BAIL_S)
+    args = parser.parse_args()
+
+    if args.postgres:
+        magasin = MagasinPostgres(args.postgres)
+    elif args.sqlite:
+        magasin = MagasinSQLite(args.sqlite)
+    else:
+        magasin = MagasinFichier(args.fichier)
+    travailleur = Travailleur(args.nom, magasin, ttl=args.ttl)
+    print(f"🧩 Travailleur {args.nom} démarré")
+    try:
+        travailleur.boucle()
+    except KeyboardInterrupt:
+        travailleur.arreter()
+
+
+if __name__ == "__main__":
+    main()
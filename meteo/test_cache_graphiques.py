@@ -0,0 +1,74 @@
+# test_cache_graphiques.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache_graphiques import CacheGraphiques
+
+DONNEES = {
+    "dates": ["2025-07-01", "2025-07-02"],
+    "temp_max": [25.0, 26.0],
+    "temp_min": [15.0, 16.0],
+    "precipitation": [0.0, 1.2]
+}
+
+
+def test_rendu_reel_png_et_svg():
+    cache = CacheGraphiques()
+    png = cache.obtenir(DONNEES, largeur=6, hauteur=3, dpi=50)
+    assert png.startswith(b"\x89PNG")
+    assert b"<svg" in cache.obtenir(DONNEES, format="svg")
+    assert cache.obtenir(DONNEES, largeur=6, hauteur=3, dpi=50) is png
+    assert cache.statistiques()["rendus"] == 2
+    assert cache.statistiques()["succes_memoire"] == 1
+
+
+def test_un_seul_rendu_pour_des_demandes_concurrentes():
+    rendus = []
+    depart = threading.Event()
+
+    def rendre_lentement(donnees, format, **options):
+        rendus.append(format)
+        time.sleep(0.2)
+        return b"image"
+
+    cache = CacheGraphiques(rendre=rendre_lentement)
+
+    def demander(_):
+        depart.wait()
+        return cache.obtenir(DONNEES)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        resultats = [pool.submit(demander, i) for i in range(8)]
+        depart.set()
+        assert {r.result() for r in resultats} == {b"image"}
+    assert rendus == ["png"]
+
+
+def test_debordement_sur_disque(tmp_path):
+    rendus = []
+
+    def rendre(donnees, format, **options):
+        rendus.append(options)
+        return f"{format}-{options}".encode()
+
+    cache = CacheGraphiques(capacite=1, repertoire=str(tmp_path), rendre=rendre)
+    premier = cache.obtenir(DONNEES, dpi=50)
+    cache.obtenir(DONNEES, dpi=100)
+    # Le premier graphique, évincé de la mémoire, est relu sur disque
+    assert cache.obtenir(DONNEES, dpi=50) == premier
+    assert rendus == [{"dpi": 50}, {"dpi": 100}]
+    assert cache.statistiques()["succes_disque"] == 1
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_repertoire_plafonne(tmp_path):
+    cache = CacheGraphiques(capacite=1, repertoire=str(tmp_path), max_fichiers=2,
+                            rendre=lambda donnees, format, **options: repr(options).encode())
+    for dpi in range(1, 6):
+        cache.obtenir(DONNEES, dpi=dpi)
+    # Quatre graphiques déversés, deux supprimés
+    assert len(list(tmp_path.iterdir())) == 2
+    assert cache.statistiques()["supprimes_disque"] == 2
+    # Un graphique supprimé est simplement redessiné
+    assert cache.obtenir(DONNEES, dpi=1) == b"{'dpi': 1}"
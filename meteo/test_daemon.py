@@ -0,0 +1,189 @@
+# test_daemon.py
+import json
+import random
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+import requests
+
+from daemon import Planificateur, demarrer_controle, prochaine_echeance
+
+
+def horodatage(texte):
+    return datetime.fromisoformat(texte).replace(tzinfo=timezone.utc).timestamp()
+
+
+def reponse(latitude, longitude):
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "daily": {
+            "time": ["2025-07-01", "2025-07-02"],
+            "temperature_2m_max": [25.0, 26.0],
+            "temperature_2m_min": [15.0, 16.0],
+            "precipitation_sum": [0.0, 1.2]
+        }
+    }
+
+
+class Horloge:
+    def __init__(self, instant):
+        self.instant = instant
+
+    def __call__(self):
+        return self.instant
+
+
+@pytest.fixture
+def sites(tmp_path):
+    return {
+        nom: {"latitude": lat, "longitude": lon, "fichier": str(tmp_path / f"{nom}.json")}
+        for nom, lat, lon in [("paris", 48.8566, 2.3522), ("lyon", 45.764, 4.8357), ("lille", 50.6292, 3.0573)]
+    }
+
+
+def test_prochaine_echeance():
+    # Run de 06h UTC disponible à 09h
+    assert prochaine_echeance(horodatage("2025-07-01T04:00:00"), gigue=0) == horodatage("2025-07-01T09:00:00")
+    # Après le dernier run du jour, celui de minuit du lendemain
+    assert prochaine_echeance(horodatage("2025-07-01T22:00:00"), gigue=0) == horodatage("2025-07-02T03:00:00")
+
+    echeance = prochaine_echeance(horodatage("2025-07-01T04:00:00"), gigue=600, alea=random.Random(1))
+    assert horodatage("2025-07-01T09:00:00") <= echeance <= horodatage("2025-07-01T09:10:00")
+
+
+def test_planificateur_regroupe_les_sites_dus(sites, tmp_path):
+    appels = []
+
+    def appeler(coordonnees):
+        appels.append(list(coordonnees))
+        return [reponse(lat, lon) for lat, lon in coordonnees]
+
+    horloge = Horloge(horodatage("2025-07-01T04:00:00"))
+    planificateur = Planificateur(sites, appeler=appeler, horloge=horloge,
+                                  fichier_empreintes=str(tmp_path / "empreintes.json"),
+                                  taille_lot=2, gigue=0)
+
+    assert planificateur.tourner_une_fois() == 3
+    assert [len(lot) for lot in appels] == [2, 1]
+    metriques = planificateur.metriques()
+    assert metriques["file_attente"] == 0
+    assert metriques["sites_planifies"] == 3
+    assert metriques["sites_modifies"] == 3
+    assert metriques["prochaine_echeance"] == "2025-07-01T09:00:00+00:00"
+
+    # Rien n'est dû avant la publication du prochain run
+    assert planificateur.tourner_une_fois() == 0
+    assert len(appels) == 2
+
+    horloge.instant = horodatage("2025-07-01T09:05:00")
+    assert planificateur.metriques()["file_attente"] == 3
+    assert planificateur.metriques()["retard_s"] == 300
+    assert planificateur.tourner_une_fois() == 3
+    metriques = planificateur.metriques()
+    assert metriques["appels_api"] == 4
+    # Prévisions identiques: aucun site recalculé
+    assert metriques["sites_modifies"] == 3
+    assert metriques["dernier_retard_s"] == 300
+
+
+def test_gigue_commune_a_la_vague(tmp_path):
+    sites = {
+        f"site-{i}": {"latitude": 45 + i / 10, "longitude": 2 + i / 10, "fichier": str(tmp_path / f"site-{i}.json")}
+        for i in range(20)
+    }
+    appels = []
+
+    def appeler(coordonnees):
+        appels.append(len(coordonnees))
+        return [reponse(lat, lon) for lat, lon in coordonnees]
+
+    horloge = Horloge(horodatage("2025-07-01T04:00:00"))
+    planificateur = Planificateur(sites, appeler=appeler, horloge=horloge,
+                                  fichier_empreintes=str(tmp_path / "empreintes.json"),
+                                  alea=random.Random(7))
+    planificateur.tourner_une_fois()
+
+    # Après la gigue par défaut, les 20 sites sont encore dus dans le même appel
+    horloge.instant = horodatage("2025-07-01T09:10:00")
+    assert planificateur.tourner_une_fois() == 20
+    assert appels == [20, 20]
+
+
+def test_planificateur_replanifie_apres_erreur(sites, tmp_path):
+    def appeler(coordonnees):
+        raise requests.RequestException("Erreur réseau")
+
+    horloge = Horloge(horodatage("2025-07-01T04:00:00"))
+    planificateur = Planificateur(sites, appeler=appeler, horloge=horloge,
+                                  fichier_empreintes=str(tmp_path / "empreintes.json"))
+    assert planificateur.tourner_une_fois() == 3
+    metriques = planificateur.metriques()
+    assert metriques["erreurs"] == 1
+    assert metriques["prochaine_echeance"] == "2025-07-01T04:05:00+00:00"
+
+
+def test_sites_en_echec_ou_sans_reponse_replanifies(sites, tmp_path):
+    # Une réponse manquante, une réponse que l'analyse ne sait pas lire
+    def appeler(coordonnees):
+        return [reponse(*coordonnees[0]), {"daily": {"time": ["2025-07-01"]}}]
+
+    horloge = Horloge(horodatage("2025-07-01T04:00:00"))
+    planificateur = Planificateur(sites, appeler=appeler, horloge=horloge,
+                                  fichier_empreintes=str(tmp_path / "empreintes.json"), gigue=0)
+    assert planificateur.tourner_une_fois() == 3
+    metriques = planificateur.metriques()
+    assert metriques["erreurs"] == 2
+    assert metriques["sites_modifies"] == 1
+    # Tous les sites restent planifiés; les deux en échec sont réessayés 5 minutes plus tard
+    assert metriques["sites_planifies"] == 3
+    assert sorted(planificateur.echeances.values()) == [
+        horodatage("2025-07-01T04:05:00"), horodatage("2025-07-01T04:05:00"), horodatage("2025-07-01T09:00:00")
+    ]
+
+
+def test_sauvegarde_en_echec_reessayee(sites, tmp_path):
+    sites["lyon"]["fichier"] = str(tmp_path / "absent" / "lyon.json")
+    horloge = Horloge(horodatage("2025-07-01T04:00:00"))
+    planificateur = Planificateur(sites, appeler=lambda c: [reponse(*x) for x in c], horloge=horloge,
+                                  fichier_empreintes=str(tmp_path / "empreintes.json"), gigue=0)
+    assert planificateur.tourner_une_fois() == 3
+    assert planificateur.metriques()["erreurs"] == 1
+    assert planificateur.metriques()["sites_modifies"] == 2
+    assert planificateur.echeances["lyon"] == horodatage("2025-07-01T04:05:00")
+    assert planificateur.echeances["paris"] == horodatage("2025-07-01T09:00:00")
+
+    # Au nouvel essai la sauvegarde réussit: l'empreinte n'avait pas été retenue
+    (tmp_path / "absent").mkdir()
+    horloge.instant = horodatage("2025-07-01T04:05:00")
+    assert planificateur.tourner_une_fois() == 1
+    assert planificateur.metriques()["sites_modifies"] == 3
+    assert planificateur.echeances["lyon"] == horodatage("2025-07-01T09:00:00")
+
+
+def test_endpoint_de_controle(sites, tmp_path):
+    horloge = Horloge(horodatage("2025-07-01T04:00:00"))
+    planificateur = Planificateur(sites, appeler=lambda c: [reponse(*x) for x in c], horloge=horloge,
+                                  fichier_empreintes=str(tmp_path / "empreintes.json"))
+    planificateur.tourner_une_fois()
+    serveur = demarrer_controle(planificateur)
+    url = f"http://127.0.0.1:{serveur.server_address[1]}"
+    try:
+        with urlopen(url + "/metrics") as r:
+            assert json.load(r)["file_attente"] == 0
+
+        with urlopen(Request(url + "/sites/lyon/rafraichir", method="POST")) as r:
+            assert r.status == 202
+        with urlopen(url + "/metrics") as r:
+            metriques = json.load(r)
+        assert metriques["file_attente"] == 1
+        # L'échéance prévue de lyon est remplacée, pas dupliquée
+        assert metriques["sites_planifies"] == 3
+
+        with pytest.raises(HTTPError) as erreur:
+            urlopen(Request(url + "/sites/brest/rafraichir", method="POST"))
+        assert erreur.value.code == 404
+    finally:
+        serveur.shutdown()
@@ -4,7 +4,8 @@ from unittest.mock import patch, mock_open
 from main import (
     est_pair, convertir_minutes,
     analyser_donnees_meteo, appeler_api_meteo,
-    sauvegarder_resultats, afficher_graphique_temperature
+    sauvegarder_resultats, afficher_graphique_temperature,
+    empreinte, empreintes_jours, jours_modifies, main
 )
 
 
@@ -44,4 +45,59 @@ def test_appeler_api_meteo_comportement():
     # --- Cas 2 : appel échoue (erreur réseau) ---
     with patch("requests.get", side_effect=requests.RequestException("Erreur réseau")):
         resultat = appeler_api_meteo(latitude, longitude)
-        assert resultat is None
\ No newline at end of file
+        assert resultat is None
+
+
+def test_empreintes_jours_delta():
+    daily = {
+        "time": ["2025-07-01", "2025-07-02"],
+        "temperature_2m_max": [25.0, 26.0],
+        "temperature_2m_min": [15.0, 16.0],
+        "precipitation_sum": [0.0, 1.2]
+    }
+    # L'ordre des clés ne change pas l'empreinte
+    assert empreinte(daily) == empreinte(dict(reversed(list(daily.items()))))
+
+    avant = empreintes_jours(daily)
+    daily_suivant = {
+        "time": ["2025-07-02", "2025-07-03"],
+        "temperature_2m_max": [26.0, 24.0],
+        "temperature_2m_min": [16.0, 14.0],
+        "precipitation_sum": [3.4, 0.0]
+    }
+    assert jours_modifies(avant, empreintes_jours(daily_suivant)) == ["2025-07-02", "2025-07-03"]
+    assert jours_modifies(avant, avant) == []
+
+
+def test_main_ne_recalcule_que_les_sites_modifies(tmp_path):
+    donnees = {
+        "daily": {
+            "time": ["2025-07-01", "2025-07-02"],
+            "temperature_2m_max": [25.0, 26.0],
+            "temperature_2m_min": [15.0, 16.0],
+            "precipitation_sum": [0.0, 1.2]
+        }
+    }
+    sites = {
+        "paris": {"latitude": 48.8566, "longitude": 2.3522, "fichier": str(tmp_path / "paris.json")},
+        "lyon": {"latitude": 45.764, "longitude": 4.8357, "fichier": str(tmp_path / "lyon.json")},
+    }
+    empreintes = str(tmp_path / "empreintes.json")
+
+    with patch("main.appeler_api_meteo", return_value=donnees), \
+            patch("main.afficher_graphique_temperature") as mock_graphique:
+        assert main(sites, empreintes) == ["paris", "lyon"]
+        assert mock_graphique.call_count == 2
+
+        # Même payload: ni analyse, ni sauvegarde, ni graphique
+        with patch("main.analyser_donnees_meteo") as mock_analyse:
+            assert main(sites, empreintes) == []
+            mock_analyse.assert_not_called()
+        assert mock_graphique.call_count == 2
+
+    modifiees = {"daily": dict(donnees["daily"], precipitation_sum=[0.0, 4.5])}
+    with patch("main.appeler_api_meteo", side_effect=[donnees, modifiees]), \
+            patch("main.afficher_graphique_temperature"):
+        assert main(sites, empreintes) == ["lyon"]
+    with open(sites["lyon"]["fichier"], encoding="utf-8") as f:
+        assert '4.5' in f.read()
@@ -0,0 +1,202 @@
+# test_repartition.py
+import os
+
+import pytest
+
+from repartition import (
+    DELAI_NOUVEL_ESSAI_S, AnneauCoherent, MagasinFichier, MagasinPostgres, MagasinSQLite, Travailleur,
+    shard_de_site
+)
+
+
+class Horloge:
+    def __init__(self, instant=1000.0):
+        self.instant = instant
+
+    def __call__(self):
+        return self.instant
+
+
+@pytest.fixture(params=["fichier", "sqlite", "postgres"])
+def magasin(request, tmp_path):
+    if request.param == "postgres":
+        pytest.importorskip("psycopg")
+        dsn = os.environ.get("METEO_POSTGRES_DSN")
+        if not dsn:
+            pytest.skip("METEO_POSTGRES_DSN non défini")
+        magasin = MagasinPostgres(dsn)
+        with magasin.connexion() as c:
+            c.execute("TRUNCATE travailleurs, baux, acquittements")
+        return magasin
+    if request.param == "sqlite":
+        return MagasinSQLite(str(tmp_path / "baux.db"))
+    return MagasinFichier(str(tmp_path / "baux.json"))
+
+
+@pytest.fixture
+def sites():
+    return {f"site-{i}": {"latitude": 45 + i / 10, "longitude": 2 + i / 10, "fichier": ""} for i in range(40)}
+
+
+class Panne(BaseException):
+    """Arrêt brutal du processus, que le travailleur ne rattrape pas"""
+
+
+def proprietaires(travailleurs):
+    return [shard for t in travailleurs for shard in t.shards]
+
+
+def test_anneau_ne_deplace_que_les_shards_du_nouveau_membre():
+    avant = AnneauCoherent(["a", "b", "c"])
+    apres = AnneauCoherent(["a", "b", "c", "d"])
+    deplaces = [s for s in range(256) if avant.proprietaire(str(s)) != apres.proprietaire(str(s))]
+    assert deplaces
+    assert all(apres.proprietaire(str(s)) == "d" for s in deplaces)
+    assert AnneauCoherent([]).proprietaire("0") is None
+    assert shard_de_site("paris", 16) == shard_de_site("paris", 16)
+
+
+def test_baux_exclusifs(magasin):
+    assert magasin.acquerir(3, "a", expire=1060, maintenant=1000)
+    assert not magasin.acquerir(3, "b", expire=1060, maintenant=1000)
+    # Renouvellement par le titulaire, reprise après expiration
+    assert magasin.acquerir(3, "a", expire=1090, maintenant=1030)
+    assert magasin.acquerir(3, "b", expire=1150, maintenant=1090)
+    magasin.liberer(3, "a")
+    assert not magasin.acquerir(3, "a", expire=1150, maintenant=1100)
+    magasin.liberer(3, "b")
+    assert magasin.acquerir(3, "a", expire=1160, maintenant=1100)
+
+
+def test_reequilibrage_quand_un_travailleur_arrive_puis_tombe(magasin, sites):
+    horloge = Horloge()
+    traites = []
+
+    def nouveau(nom):
+        return Travailleur(nom, magasin, sites, nb_shards=16, ttl=60,
+                           traiter=lambda site, config: traites.append(site) or True, horloge=horloge)
+
+    a, b = nouveau("a"), nouveau("b")
+    for _ in range(2):
+        for t in (a, b):
+            t.reequilibrer()
+    assert sorted(proprietaires([a, b])) == list(range(16))
+
+    # c arrive: a et b cèdent les shards que l'anneau lui attribue
+    c = nouveau("c")
+    for _ in range(2):
+        for t in (c, a, b, c):
+            t.reequilibrer()
+    assert c.shards
+    assert sorted(proprietaires([a, b, c])) == list(range(16))
+
+    # b tombe sans prévenir: ses shards sont repris après expiration du bail
+    horloge.instant += 61
+    for t in (a, c, a, c):
+        t.reequilibrer()
+    assert sorted(proprietaires([a, c])) == list(range(16))
+
+    for t in (a, c):
+        t.tourner_une_fois(cycle=1)
+    assert sorted(traites) == sorted(sites)
+
+
+def test_au_moins_une_fois(magasin, sites):
+    horloge = Horloge()
+    traites = []
+
+    def traiter_puis_tomber(site, config):
+        traites.append(site)
+        if len(traites) == 3:
+            raise Panne()
+        return True
+
+    a = Travailleur("a", magasin, sites, nb_shards=4, ttl=60, traiter=traiter_puis_tomber, horloge=horloge)
+    with pytest.raises(Panne):
+        a.tourner_une_fois(cycle=1)
+
+    # b attend l'expiration des baux de a, puis reprend tout ce qui n'est pas acquitté
+    b = Travailleur("b", magasin, sites, nb_shards=4, ttl=60,
+                    traiter=lambda site, config: traites.append(site) or True, horloge=horloge)
+    b.tourner_une_fois(cycle=1)
+    assert b.shards == set()
+    horloge.instant += 61
+    b.tourner_une_fois(cycle=1)
+
+    assert set(traites) == set(sites)
+    # Les deux sites acquittés par a ne sont pas retraités, le troisième l'est
+    assert len(traites) == len(sites) + 1
+    assert b.tourner_une_fois(cycle=1) == []
+    assert len(b.tourner_une_fois(cycle=2)) == len(sites)
+
+
+def test_sites_en_echec_reessayes_plus_tard(magasin, sites):
+    horloge = Horloge()
+    appels = []
+
+    def traiter(site, config):
+        appels.append(site)
+        if site == "site-1":
+            raise ValueError("réponse illisible")
+        return site != "site-2"
+
+    a = Travailleur("a", magasin, sites, nb_shards=4, ttl=60, traiter=traiter, horloge=horloge)
+    # Les échecs n'interrompent pas le tour: tous les autres sites sont acquittés
+    assert len(a.tourner_une_fois(cycle=1)) == len(sites) - 2
+
+    # Pas de nouvel essai avant le délai, puis un délai doublé à chaque échec
+    appels.clear()
+    a.tourner_une_fois(cycle=1)
+    assert appels == []
+    horloge.instant += DELAI_NOUVEL_ESSAI_S
+    a.tourner_une_fois(cycle=1)
+    assert sorted(appels) == ["site-1", "site-2"]
+    horloge.instant += DELAI_NOUVEL_ESSAI_S
+    a.tourner_une_fois(cycle=1)
+    assert len(appels) == 2
+    horloge.instant += DELAI_NOUVEL_ESSAI_S
+    a.tourner_une_fois(cycle=1)
+    assert len(appels) == 4
+
+
+def test_acquittements_des_cycles_passes_purges(magasin, sites):
+    horloge = Horloge()
+    a = Travailleur("a", magasin, sites, nb_shards=4, ttl=60, traiter=lambda site, config: True, horloge=horloge)
+    a.tourner_une_fois(cycle=1)
+    assert magasin.acquittes(list(sites), 1) == set(sites)
+    a.tourner_une_fois(cycle=2)
+    assert magasin.acquittes(list(sites), 1) == set()
+    assert magasin.acquittes(list(sites), 2) == set(sites)
+
+
+def test_boucle_survit_aux_erreurs(tmp_path, sites):
+    magasin = MagasinFichier(str(tmp_path / "baux.json"))
+    tours = []
+
+    class TravailleurInstable(Travailleur):
+        def tourner_une_fois(self, cycle=None):
+            tours.append(cycle)
+            if len(tours) == 1:
+                raise OSError("magasin indisponible")
+            self.arreter()
+            return []
+
+    t = TravailleurInstable("a", magasin, sites, nb_shards=4, ttl=0.03)
+    t.boucle()
+    assert len(tours) == 2
+
+
+def test_battement_pendant_un_shard_lent(magasin, sites):
+    horloge = Horloge()
+
+    def traiter_lentement(site, config):
+        horloge.instant += 40
+        return True
+
+    a = Travailleur("a", magasin, sites, nb_shards=1, ttl=60, traiter=traiter_lentement, horloge=horloge)
+    vivant = []
+    a.traiter = lambda site, config: vivant.append(magasin.vivants(horloge())) or traiter_lentement(site, config)
+    a.tourner_une_fois(cycle=1)
+    # Toujours vivant pour les autres travailleurs, bien après le TTL du premier battement
+    assert horloge() == 1000 + 40 * len(sites)
+    assert vivant == [["a"]] * len(sites)